@@ -1,39 +1,10 @@
 import tkinter as tk
 from tkinter import scrolledtext
-import re
 
-# ---------- Config ----------
-STOPWORDS = {
-    "o", "a", "os", "as", "de", "do", "da", "dos", "das", "em", "no", "na", "nos", "nas",
-    "para", "por", "que", "e", "ou", "um", "uma", "como", "é", "ser", "ter", "ao", "aos"
-}
+from engine import KnowledgeBase
 
 # ---------- Base de conhecimento ----------
-def carregar_base():
-    with open("base.txt", "r", encoding="utf-8") as f:
-        linhas = [l.strip() for l in f.readlines() if l.strip()]
-
-    base = []
-    i = 0
-    while i < len(linhas):
-        if linhas[i].startswith("[") and linhas[i].endswith("]"):
-            palavras = [p.strip().lower() for p in linhas[i + 1].split(",")]
-            resposta = linhas[i + 2]
-            base.append({"palavras": palavras, "resposta": resposta})
-            i += 3
-        else:
-            i += 1
-    return base
-
-base = carregar_base()
-
-# ---------- Util ----------
-def normalizar(texto):
-    texto = texto.lower()
-    texto = re.sub(r"[^\w\sáéíóúâêôãõç]", " ", texto)
-    palavras = texto.split()
-    palavras = [p for p in palavras if p not in STOPWORDS]
-    return texto, palavras
+kb = KnowledgeBase({"base": "base.txt"})
 
 # ---------- Lógica ----------
 def responder(event=None):
@@ -41,35 +12,10 @@ def responder(event=None):
     if not pergunta:
         return
 
-    pergunta_norm, tokens = normalizar(pergunta)
-
     chat.config(state=tk.NORMAL)
     chat.insert(tk.END, f"Você: {pergunta}\n")
 
-    melhor_item = None
-    melhor_pontos = 0
-
-    for item in base:
-        pontos = 0
-        for chave in item["palavras"]:
-            chave = chave.lower()
-
-            # Frase completa bate exatamente
-            if len(chave.split()) > 1 and chave in pergunta_norm:
-                pontos += 5
-            else:
-                # Palavra solta
-                if chave in tokens:
-                    pontos += 1
-
-        if pontos > melhor_pontos:
-            melhor_pontos = pontos
-            melhor_item = item
-
-    if melhor_item and melhor_pontos > 0:
-        resposta = melhor_item["resposta"]
-    else:
-        resposta = "Ainda não encontrei essa resposta na minha base. Tente perguntar de outro jeito ou fale com a secretaria paroquial."
+    resposta = kb.responder(pergunta)
 
     chat.insert(tk.END, f"IA: {resposta}\n\n")
     chat.config(state=tk.DISABLED)
@@ -0,0 +1,181 @@
+# Ponto de entrada ASGI para produção.
+#
+# O app Flask (web.py) roda inteiro num pool de threads de cada processo:
+# o loop de eventos só recebe as conexões e espera, enquanto a busca na
+# base (CPU) e o SQLite rodam nas threads. O histórico já é gravado em
+# segundo plano pelo GravadorHistorico; no desligamento do worker a fila é
+# esvaziada antes de sair.
+#
+# Subir com vários processos (WEB_WORKERS, padrão = número de CPUs):
+#     pip install uvicorn
+#     pip install Pillow brotli              # opcional: logos menores e CSS/JS em brotli (estaticos.py)
+#     flask --app web compilar-base        # opcional: evita que cada worker indexe a base
+#     python asgi.py
+#
+# ou, com gunicorn gerenciando os processos:
+#     pip install gunicorn uvicorn-worker
+#     gunicorn -w 4 -k uvicorn_worker.UvicornWorker -b 0.0.0.0:5000 asgi:application
+#
+# Teste de concorrência (com o servidor no ar, em outro terminal):
+#     python benchmarks/concorrencia.py --url http://127.0.0.1:5000 -c 200 -r 5
+# O teste dispara 200 clientes simultâneos, 5 perguntas cada, confere que
+# todas as respostas vieram com status 200 e que todas as perguntas
+# chegaram à tabela historico.
+
+import asyncio
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from web import app, gravador_historico
+
+ASGI_THREADS = int(os.environ.get("ASGI_THREADS", 16))
+ASGI_BLOCO = 64 * 1024    # bytes da resposta juntados em cada envio
+
+executor = ThreadPoolExecutor(max_workers=ASGI_THREADS, thread_name_prefix="wsgi")
+
+def montar_environ(scope, corpo):
+    servidor = scope.get("server") or ("localhost", 80)
+    cliente = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope["query_string"].decode("latin-1"),
+        "SERVER_NAME": servidor[0],
+        "SERVER_PORT": str(servidor[1]),
+        "REMOTE_ADDR": cliente[0],
+        "REMOTE_PORT": str(cliente[1]),
+        "SERVER_PROTOCOL": "HTTP/" + scope.get("http_version", "1.1"),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(corpo),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+        # O corpo já chegou inteiro: o tamanho é o dele, mesmo quando o
+        # cliente mandou em partes (chunked), sem Content-Length.
+        "CONTENT_LENGTH": str(len(corpo)),
+    }
+    for nome, valor in scope["headers"]:
+        nome = nome.decode("latin-1")
+        valor = valor.decode("latin-1")
+        if nome == "content-type":
+            environ["CONTENT_TYPE"] = valor
+        elif nome in ("content-length", "transfer-encoding"):
+            continue
+        else:
+            # cabeçalhos repetidos viram um só; os cookies se separam por "; "
+            chave = "HTTP_" + nome.upper().replace("-", "_")
+            separador = "; " if chave == "HTTP_COOKIE" else ","
+            environ[chave] = environ[chave] + separador + valor if chave in environ else valor
+    return environ
+
+class RespostaWSGI:
+    # A resposta do app, lida aos blocos de até ASGI_BLOCO bytes: um arquivo
+    # grande (o logo original tem 1,5 MB) não fica inteiro na memória. Tudo
+    # aqui roda numa thread do executor.
+    def __init__(self, environ):
+        self.status = None
+        self.headers = None
+        self.partes = []
+        self.fim = False
+        self.resultado = app(environ, self._start_response)
+        self.iterador = iter(self.resultado)
+
+    def _start_response(self, status, headers, exc_info=None):
+        self.status = int(status.split(" ", 1)[0])
+        self.headers = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+        return self.partes.append
+
+    def bloco(self):
+        # o que veio por write() primeiro; o start_response pode ser chamado
+        # só na primeira parte, então o status só vale depois do primeiro bloco
+        bloco = list(self.partes)
+        self.partes.clear()
+        tamanho = sum(map(len, bloco))
+        while tamanho < ASGI_BLOCO:
+            try:
+                parte = next(self.iterador)
+            except StopIteration:
+                self.fim = True
+                break
+            bloco.append(parte)
+            tamanho += len(parte)
+        return b"".join(bloco)
+
+    def fechar(self):
+        if hasattr(self.resultado, "close"):
+            self.resultado.close()
+
+async def ciclo_de_vida(receive, send):
+    while True:
+        mensagem = await receive()
+        if mensagem["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif mensagem["type"] == "lifespan.shutdown":
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, gravador_historico.encerrar)
+            executor.shutdown(wait=True)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+async def responder_grande_demais(send):
+    await send({"type": "http.response.start", "status": 413,
+                "headers": [(b"content-type", b"text/plain; charset=utf-8")]})
+    await send({"type": "http.response.body", "body": "Requisição grande demais.".encode("utf-8")})
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await ciclo_de_vida(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    # O corpo é lido inteiro antes de chamar o Flask, então o limite do app
+    # (MAX_CONTENT_LENGTH) vale já aqui: pelo Content-Length declarado e,
+    # sem ele (chunked), pelo que foi chegando.
+    maximo = app.config["MAX_CONTENT_LENGTH"]
+    declarado = dict(scope["headers"]).get(b"content-length", b"")
+    if maximo is not None and declarado.isdigit() and int(declarado) > maximo:
+        await responder_grande_demais(send)
+        return
+
+    corpo = bytearray()
+    while True:
+        mensagem = await receive()
+        if mensagem["type"] == "http.disconnect":
+            return
+        corpo += mensagem.get("body", b"")
+        if maximo is not None and len(corpo) > maximo:
+            await responder_grande_demais(send)
+            return
+        if not mensagem.get("more_body"):
+            break
+
+    loop = asyncio.get_running_loop()
+    resposta = await loop.run_in_executor(executor, RespostaWSGI, montar_environ(scope, bytes(corpo)))
+    try:
+        bloco = await loop.run_in_executor(executor, resposta.bloco)
+        await send({"type": "http.response.start", "status": resposta.status, "headers": resposta.headers})
+        while True:
+            await send({"type": "http.response.body", "body": bloco, "more_body": not resposta.fim})
+            if resposta.fim:
+                break
+            bloco = await loop.run_in_executor(executor, resposta.bloco)
+    finally:
+        await loop.run_in_executor(executor, resposta.fechar)
+
+# ---------- Run ----------
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(
+        "asgi:application",
+        host=os.environ.get("HOST", "0.0.0.0"),
+        port=int(os.environ.get("PORT", 5000)),
+        workers=int(os.environ.get("WEB_WORKERS", os.cpu_count() or 1)),
+        lifespan="on",
+    )
@@ -0,0 +1,285 @@
+# Teste de carga e latência do chat.
+#
+# Repete uma mistura realista de perguntas (as mais recentes da tabela
+# historico, ou um arquivo com uma pergunta por linha) contra POST "/" e
+# POST /api/perguntar, com concorrência crescente, e mostra requisições por
+# segundo e latência p50/p95/p99 em cada nível.
+#
+# Sem --url o app roda no próprio processo, pelo test client do Flask, numa
+# cópia temporária de data/, base.txt e paroquia.db: o banco de verdade não
+# recebe as perguntas do teste.
+#
+# Uso (na raiz do projeto):
+#     python benchmarks/carga.py                                # árvore atual
+#     python benchmarks/carga.py -c 1,8,32 -n 1000
+#     python benchmarks/carga.py --url http://127.0.0.1:5000    # servidor no ar
+#     python benchmarks/carga.py --comparar HEAD~1 HEAD         # dois commits
+#
+# Em --comparar cada commit é extraído com "git worktree" num diretório
+# temporário e medido em um processo separado, com as mesmas perguntas.
+
+import argparse
+import json
+import math
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.cookiejar import CookieJar
+from urllib.parse import quote_plus
+from urllib.request import HTTPCookieProcessor, Request, build_opener
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ROTAS = {
+    "index": "/",
+    "api": "/api/perguntar",
+}
+
+PERGUNTAS_PADRAO = [
+    "Qual o horário da missa?",
+    "Qual o contato da secretaria paroquial?",
+    "O que é o Batismo?",
+    "Como entrar na catequese?",
+    "horario da missa domingo",
+    "como marcar batismo",
+    "tem confissão hoje?",
+    "o que é a eucaristia",
+]
+
+# ---------- Perguntas ----------
+def ler_perguntas(arquivo, db, limite):
+    if arquivo:
+        perguntas = []
+        with open(arquivo, "r", encoding="utf-8") as f:
+            for linha in f:
+                linha = linha.strip()
+                if not linha:
+                    continue
+                if linha.startswith("{"):
+                    linha = str(json.loads(linha).get("pergunta", "")).strip()
+                if linha:
+                    perguntas.append(linha)
+        return perguntas[:limite]
+
+    if db and os.path.exists(db):
+        conn = sqlite3.connect(db)
+        try:
+            linhas = conn.execute(
+                "SELECT pergunta FROM historico ORDER BY id DESC LIMIT ?", (limite,)
+            ).fetchall()
+        except sqlite3.Error:
+            linhas = []
+        conn.close()
+        perguntas = [l[0] for l in linhas if l[0] and l[0].strip()]
+        if perguntas:
+            return perguntas
+
+    return PERGUNTAS_PADRAO
+
+# ---------- Clientes ----------
+def cliente_local(app):
+    cliente = app.test_client()
+
+    def enviar(rota, pergunta):
+        if rota == "api":
+            resposta = cliente.post(ROTAS[rota], json={"pergunta": pergunta})
+        else:
+            resposta = cliente.post(ROTAS[rota], data={"pergunta": pergunta})
+        return resposta.status_code
+
+    return enviar
+
+def cliente_http(url):
+    abridor = build_opener(HTTPCookieProcessor(CookieJar()))
+
+    def enviar(rota, pergunta):
+        if rota == "api":
+            corpo = json.dumps({"pergunta": pergunta}).encode("utf-8")
+            tipo = "application/json"
+        else:
+            corpo = ("pergunta=" + quote_plus(pergunta)).encode("ascii")
+            tipo = "application/x-www-form-urlencoded"
+        requisicao = Request(url + ROTAS[rota], data=corpo, headers={"Content-Type": tipo})
+        try:
+            with abridor.open(requisicao, timeout=30) as resposta:
+                resposta.read()
+                return resposta.status
+        except Exception as erro:
+            return getattr(erro, "code", 0)
+
+    return enviar
+
+# ---------- Medição ----------
+def percentil(tempos, p):
+    if not tempos:
+        return 0.0
+    return tempos[min(len(tempos) - 1, max(0, math.ceil(p / 100 * len(tempos)) - 1))]
+
+def medir(fabrica_cliente, rota, perguntas, concorrencia, total):
+    tempos = []
+    erros = [0]
+    proxima = [0]
+    trava = threading.Lock()
+
+    def trabalhador():
+        enviar = fabrica_cliente()
+        while True:
+            with trava:
+                i = proxima[0]
+                proxima[0] += 1
+            if i >= total:
+                return
+            inicio = time.perf_counter()
+            status = enviar(rota, perguntas[i % len(perguntas)])
+            duracao = time.perf_counter() - inicio
+            with trava:
+                tempos.append(duracao)
+                if status != 200:
+                    erros[0] += 1
+
+    threads = [threading.Thread(target=trabalhador) for _ in range(concorrencia)]
+    inicio = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duracao = time.perf_counter() - inicio
+
+    tempos.sort()
+    return {
+        "rota": rota,
+        "concorrencia": concorrencia,
+        "requisicoes": len(tempos),
+        "erros": erros[0],
+        "rps": len(tempos) / duracao if duracao else 0.0,
+        "p50": percentil(tempos, 50) * 1000,
+        "p95": percentil(tempos, 95) * 1000,
+        "p99": percentil(tempos, 99) * 1000,
+    }
+
+def preparar_app(raiz):
+    # cópia temporária dos dados: o teste não grava no banco de verdade
+    temporario = tempfile.mkdtemp(prefix="carga-")
+    for nome in ("data", "base.txt", "paroquia.db"):
+        origem = os.path.join(raiz, nome)
+        if os.path.isdir(origem):
+            shutil.copytree(origem, os.path.join(temporario, nome))
+        elif os.path.exists(origem):
+            shutil.copy2(origem, temporario)
+    os.chdir(temporario)
+    sys.path.insert(0, raiz)
+    import web
+    return web.app, temporario
+
+def executar(args, perguntas):
+    if args.url:
+        url = args.url.rstrip("/")
+        fabrica = lambda: cliente_http(url)
+        temporario = None
+    else:
+        app, temporario = preparar_app(args.raiz)
+        fabrica = lambda: cliente_local(app)
+
+    resultados = []
+    try:
+        for rota in args.rotas:
+            fabrica()(rota, perguntas[0])   # aquecimento
+            for concorrencia in args.concorrencia:
+                resultados.append(medir(fabrica, rota, perguntas, concorrencia, args.requisicoes))
+    finally:
+        if temporario:
+            os.chdir(RAIZ)
+            shutil.rmtree(temporario, ignore_errors=True)
+    return resultados
+
+# ---------- Relatório ----------
+def imprimir(resultados, titulo=None):
+    if titulo:
+        print(f"== {titulo}")
+    print(f"{'rota':6s} {'conc':>5s} {'req/s':>9s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s} {'erros':>6s}")
+    for r in resultados:
+        print(f"{r['rota']:6s} {r['concorrencia']:5d} {r['rps']:9.0f} {r['p50']:8.2f} "
+              f"{r['p95']:8.2f} {r['p99']:8.2f} {r['erros']:6d}")
+
+def imprimir_comparacao(rev_a, a, rev_b, b):
+    print(f"== {rev_a} -> {rev_b}")
+    print(f"{'rota':6s} {'conc':>5s} {'req/s':>17s} {'p95 ms':>19s} {'p99 ms':>19s}")
+    antes = {(r["rota"], r["concorrencia"]): r for r in a}
+    for r in b:
+        x = antes.get((r["rota"], r["concorrencia"]))
+        if not x:
+            continue
+        def delta(chave):
+            return (r[chave] - x[chave]) / x[chave] * 100 if x[chave] else 0.0
+        aviso = "  (erros)" if r["erros"] or x["erros"] else ""
+        print(f"{r['rota']:6s} {r['concorrencia']:5d} "
+              f"{x['rps']:6.0f}->{r['rps']:<6.0f}{delta('rps'):+4.0f}% "
+              f"{x['p95']:6.2f}->{r['p95']:<6.2f}{delta('p95'):+4.0f}% "
+              f"{x['p99']:6.2f}->{r['p99']:<6.2f}{delta('p99'):+4.0f}%{aviso}")
+
+def comparar(args, perguntas):
+    with tempfile.TemporaryDirectory(prefix="carga-cmp-") as pasta:
+        arquivo_perguntas = os.path.join(pasta, "perguntas.txt")
+        with open(arquivo_perguntas, "w", encoding="utf-8") as f:
+            f.write("\n".join(p.replace("\n", " ") for p in perguntas))
+
+        medidas = []
+        for rev in args.comparar:
+            arvore = os.path.join(pasta, f"arvore{len(medidas)}")
+            subprocess.run(["git", "-C", RAIZ, "worktree", "add", "--detach", "-q", arvore, rev], check=True)
+            try:
+                saida = os.path.join(pasta, f"resultado{len(medidas)}.json")
+                comando = [
+                    sys.executable, os.path.abspath(__file__),
+                    "--raiz", arvore, "--perguntas", arquivo_perguntas, "--json", saida,
+                    "-n", str(args.requisicoes),
+                    "-c", ",".join(str(c) for c in args.concorrencia),
+                    "--rotas", ",".join(args.rotas),
+                ]
+                subprocess.run(comando, check=True, stdout=subprocess.DEVNULL)
+                with open(saida, "r", encoding="utf-8") as f:
+                    medidas.append(json.load(f))
+            finally:
+                subprocess.run(["git", "-C", RAIZ, "worktree", "remove", "--force", arvore], check=False)
+
+        for rev, resultados in zip(args.comparar, medidas):
+            imprimir(resultados, rev)
+            print()
+        imprimir_comparacao(args.comparar[0], medidas[0], args.comparar[1], medidas[1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga e latência do chat.")
+    parser.add_argument("--url", help="servidor no ar; sem isso usa o test client do Flask")
+    parser.add_argument("-c", "--concorrencia", default="1,4,16,64",
+                        help="níveis de concorrência separados por vírgula")
+    parser.add_argument("-n", "--requisicoes", type=int, default=500, help="requisições por nível")
+    parser.add_argument("--rotas", default="index,api", help="rotas a medir: index, api")
+    parser.add_argument("--perguntas", help="arquivo com uma pergunta por linha (ou JSON lines com 'pergunta')")
+    parser.add_argument("--db", default=os.path.join(RAIZ, "paroquia.db"), help="banco de onde tirar as perguntas")
+    parser.add_argument("--limite", type=int, default=2000, help="máximo de perguntas do histórico")
+    parser.add_argument("--comparar", nargs=2, metavar=("REV_A", "REV_B"), help="compara dois commits")
+    parser.add_argument("--raiz", default=RAIZ, help=argparse.SUPPRESS)
+    parser.add_argument("--json", help="grava os resultados em JSON neste arquivo")
+    args = parser.parse_args()
+
+    args.concorrencia = [int(c) for c in args.concorrencia.split(",") if c.strip()]
+    args.rotas = [r.strip() for r in args.rotas.split(",") if r.strip() in ROTAS]
+    perguntas = ler_perguntas(args.perguntas, args.db, args.limite)
+
+    if args.comparar:
+        comparar(args, perguntas)
+        return
+
+    resultados = executar(args, perguntas)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f)
+    imprimir(resultados, f"{len(perguntas)} perguntas distintas")
+
+if __name__ == "__main__":
+    main()
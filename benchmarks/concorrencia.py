@@ -0,0 +1,89 @@
+# Teste de concorrência contra um servidor no ar (ver asgi.py).
+#
+# Cada cliente tem o seu próprio cookie de sessão e faz várias perguntas
+# em /api/perguntar ao mesmo tempo que os outros. No fim o teste confere
+# que nenhuma requisição falhou e, se tiver acesso ao paroquia.db, que
+# todas as perguntas foram gravadas no histórico.
+#
+# Uso:
+#     python benchmarks/concorrencia.py --url http://127.0.0.1:5000 -c 200 -r 5
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from http.cookiejar import CookieJar
+from urllib.request import HTTPCookieProcessor, Request, build_opener
+
+PERGUNTAS = [
+    "Qual o horário da missa?",
+    "Qual o contato da secretaria paroquial?",
+    "O que é o Batismo?",
+    "Como entrar na catequese?",
+    "Tem confissão hoje?",
+]
+
+def cliente(url, repeticoes, marca, resultados, barreira):
+    abridor = build_opener(HTTPCookieProcessor(CookieJar()))
+    barreira.wait()
+    for i in range(repeticoes):
+        pergunta = f"{PERGUNTAS[i % len(PERGUNTAS)]} [{marca}]"
+        corpo = json.dumps({"pergunta": pergunta}).encode("utf-8")
+        requisicao = Request(url + "/api/perguntar", data=corpo, headers={"Content-Type": "application/json"})
+        inicio = time.perf_counter()
+        try:
+            with abridor.open(requisicao, timeout=30) as resposta:
+                ok = resposta.status == 200 and "resposta" in json.load(resposta)
+        except Exception:
+            ok = False
+        resultados.append((ok, time.perf_counter() - inicio))
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de concorrência do chat.")
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("-c", "--clientes", type=int, default=200, help="clientes simultâneos")
+    parser.add_argument("-r", "--repeticoes", type=int, default=5, help="perguntas por cliente")
+    parser.add_argument("--db", default="paroquia.db", help="banco para conferir o histórico")
+    parser.add_argument("--espera", type=float, default=3.0, help="segundos até conferir o histórico")
+    args = parser.parse_args()
+
+    marca = uuid.uuid4().hex[:8]
+    resultados = []
+    barreira = threading.Barrier(args.clientes)
+    threads = [
+        threading.Thread(target=cliente, args=(args.url.rstrip("/"), args.repeticoes, marca, resultados, barreira))
+        for _ in range(args.clientes)
+    ]
+
+    inicio = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    total = time.perf_counter() - inicio
+
+    falhas = sum(1 for ok, _ in resultados if not ok)
+    tempos = sorted(t for _, t in resultados)
+    print(f"{len(resultados)} requisições em {total:.2f}s ({len(resultados) / total:.0f} req/s)")
+    print(f"latência p50 {tempos[len(tempos) // 2] * 1000:.0f} ms, máx {tempos[-1] * 1000:.0f} ms")
+    print(f"falhas: {falhas}")
+
+    ok = falhas == 0
+    if os.path.exists(args.db):
+        time.sleep(args.espera)
+        conn = sqlite3.connect(args.db)
+        gravadas = conn.execute(
+            "SELECT COUNT(*) FROM historico WHERE pergunta LIKE ?", (f"%[{marca}]",)
+        ).fetchone()[0]
+        conn.close()
+        print(f"histórico: {gravadas}/{len(resultados)} perguntas gravadas")
+        ok = ok and gravadas == len(resultados)
+
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
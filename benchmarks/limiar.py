@@ -0,0 +1,115 @@
+# Calibração do limiar do modo bm25 (engine.BM25_LIMIAR).
+#
+# Responde, com cada limiar de uma faixa, três grupos de perguntas sobre
+# base.txt:
+#   - chave: as próprias palavras-chave de cada item;
+#   - reformulada e fora: as de benchmarks/perguntas_rotuladas.txt, sobre
+#     itens da base com outras palavras e de outros assuntos.
+# Para cada limiar mostra quantas foram respondidas com um item aceito
+# (certas), com um item errado ou, nas de fora, com qualquer item (erradas).
+# Ficar com a resposta padrão custa menos que uma resposta errada: a linha
+# marcada é a de menor 2 * erradas - certas (uma errada vale por duas
+# perdidas) e, no empate, o menor limiar.
+#
+# Uso (na raiz do projeto):
+#     python benchmarks/limiar.py
+#     python benchmarks/limiar.py --de 0.1 --ate 0.4 --detalhes 0.22
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import engine
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PERGUNTAS = os.path.join(RAIZ, "benchmarks", "perguntas_rotuladas.txt")
+
+# ---------- Perguntas ----------
+def ler_rotuladas(caminho):
+    # [(tipo, {títulos aceitos}, pergunta)]
+    perguntas = []
+    with open(caminho, "r", encoding="utf-8") as f:
+        for numero, linha in enumerate(f, 1):
+            linha = linha.strip()
+            if not linha or linha.startswith("#"):
+                continue
+            tipo, titulos, pergunta = (p.strip() for p in linha.split("|", 2))
+            if tipo not in ("reformulada", "fora"):
+                raise ValueError(f"{caminho}:{numero}: tipo desconhecido {tipo!r}")
+            perguntas.append((tipo, set(titulos.split()) - {"-"}, pergunta))
+    return perguntas
+
+def perguntas_das_chaves(itens):
+    # cada palavra-chave aceita o item dela e os outros que têm a mesma chave
+    donos = {}
+    for item in itens:
+        for chave in item.palavras:
+            if chave:
+                donos.setdefault(chave, set()).add(item.titulo)
+    return [("chave", titulos, chave) for chave, titulos in donos.items()]
+
+# ---------- Avaliação ----------
+def avaliar(base, perguntas, limiar):
+    kb = engine.KnowledgeBase({"base": base}, tamanho_cache=0, modo="bm25", limiar_bm25=limiar)
+    contagem = {}
+    falhas = []
+    for tipo, aceitos, pergunta in perguntas:
+        item, pontos = kb.avaliar(pergunta)
+        c = contagem.setdefault(tipo, {"total": 0, "certas": 0, "erradas": 0})
+        c["total"] += 1
+        if item is None:
+            if aceitos:
+                falhas.append((tipo, pergunta, None, pontos))
+        elif item.titulo in aceitos:
+            c["certas"] += 1
+        else:
+            c["erradas"] += 1
+            falhas.append((tipo, pergunta, item.titulo, pontos))
+    return contagem, falhas
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibração do limiar do modo bm25.")
+    parser.add_argument("--base", default=os.path.join(RAIZ, "base.txt"))
+    parser.add_argument("--perguntas", default=PERGUNTAS)
+    parser.add_argument("--de", type=float, default=0.10)
+    parser.add_argument("--ate", type=float, default=0.50)
+    parser.add_argument("--passo", type=float, default=0.01)
+    parser.add_argument("--detalhes", type=float, default=None,
+                        help="lista as perguntas erradas ou sem resposta com este limiar")
+    args = parser.parse_args()
+
+    perguntas = perguntas_das_chaves(engine.carregar_arquivo(args.base)) + ler_rotuladas(args.perguntas)
+    tipos = ("chave", "reformulada", "fora")
+
+    linhas = []
+    limiar = args.de
+    while limiar <= args.ate + 1e-9:
+        contagem, _ = avaliar(args.base, perguntas, round(limiar, 4))
+        certas = sum(c["certas"] for c in contagem.values())
+        erradas = sum(c["erradas"] for c in contagem.values())
+        linhas.append((round(limiar, 4), contagem, certas, erradas))
+        limiar += args.passo
+    melhor = min(linhas, key=lambda l: (2 * l[3] - l[2], l[0]))
+
+    print(f"{'limiar':>7s}" + "".join(f" {t + ' certas/erradas':>28s}" for t in tipos))
+    for limiar, contagem, certas, erradas in linhas:
+        colunas = ""
+        for t in tipos:
+            c = contagem.get(t, {"total": 0, "certas": 0, "erradas": 0})
+            colunas += f" {c['certas']:>9d}/{c['erradas']:<4d} de {c['total']:<11d}"
+        marca = "  <-" if limiar == melhor[0] else ""
+        atual = "  (BM25_LIMIAR)" if abs(limiar - engine.BM25_LIMIAR) < 1e-9 else ""
+        print(f"{limiar:7.2f}{colunas}{marca}{atual}")
+
+    if args.detalhes is not None:
+        _, falhas = avaliar(args.base, perguntas, args.detalhes)
+        print(f"\nCom limiar {args.detalhes}:")
+        for tipo, pergunta, titulo, pontos in falhas:
+            if tipo != "chave":
+                print(f"  {tipo:12s} {pontos:5.2f} {pergunta!r} -> {titulo or 'resposta padrão'}")
+        print(f"  e {sum(1 for f in falhas if f[0] == 'chave')} palavra(s)-chave erradas ou sem resposta")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+# Micro-benchmark do motor de respostas (engine.py) com bases sintéticas.
+#
+# Gera bases no formato dos arquivos de data/ ([TITULO] / palavras-chave /
+# resposta) com 100, 1 mil, 10 mil e 100 mil itens e mede, separadamente:
+#   - leitura do arquivo (carregar_arquivo) e montagem do índice (Indice);
+#   - normalizar() por pergunta;
+#   - escolha da resposta pelo índice e pela varredura linear antiga;
+#   - memória retida pela base carregada e pico durante a carga.
+#
+# As palavras vêm do vocabulário de base.txt mais palavras inventadas, com
+# distribuição de Zipf, para que termos como "missa" e "batismo" se repitam
+# entre itens como acontece na base real.
+#
+# Uso (na raiz do projeto):
+#     python benchmarks/motor.py
+#     python benchmarks/motor.py --tamanhos 1000,100000 --perguntas 500
+
+import argparse
+import gc
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import engine
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# ---------- Base sintética ----------
+def vocabulario(extra):
+    palavras = set()
+    caminho = os.path.join(RAIZ, "base.txt")
+    if os.path.exists(caminho):
+        for item in engine.carregar_arquivo(caminho):
+            for chave in item.palavras:
+                palavras.update(chave.split())
+    palavras = sorted(p for p in palavras if p not in engine.STOPWORDS)
+    return palavras + [f"termo{i}" for i in range(extra)]
+
+def gerar_base(caminho, tamanho, rng):
+    palavras = vocabulario(max(200, tamanho // 5))
+    # pesos de Zipf: as primeiras palavras aparecem muito mais (acumulados
+    # uma vez só; random.choices refaria a soma a cada chamada)
+    pesos = list(itertools.accumulate(1 / (i + 1) for i in range(len(palavras))))
+    rng.shuffle(palavras)
+
+    chaves_geradas = []
+    with open(caminho, "w", encoding="utf-8") as f:
+        for i in range(tamanho):
+            chaves = []
+            for _ in range(rng.randint(3, 12)):
+                n = 1 if rng.random() < 0.6 else rng.randint(2, 4)
+                termos = rng.choices(palavras, cum_weights=pesos, k=n)
+                if n > 1 and rng.random() < 0.5:
+                    termos.insert(1, rng.choice(["da", "de", "do", "o", "a"]))
+                chaves.append(" ".join(termos))
+            resposta = " ".join(rng.choices(palavras, cum_weights=pesos, k=rng.randint(15, 60))).capitalize() + "."
+            f.write(f"[ITEM_{i}]\n{', '.join(chaves)}\n{resposta}\n\n")
+            chaves_geradas.append(chaves)
+    return chaves_geradas, palavras, pesos
+
+def gerar_perguntas(chaves_geradas, palavras, pesos, n, rng):
+    perguntas = []
+    for _ in range(n):
+        partes = ["qual", "o"]
+        if rng.random() < 0.7:
+            partes.append(rng.choice(rng.choice(chaves_geradas)))
+        partes.extend(rng.choices(palavras, cum_weights=pesos, k=rng.randint(1, 4)))
+        perguntas.append(" ".join(partes) + rng.choice(["?", "", "!"]))
+    return perguntas
+
+# ---------- Referência ----------
+def escolher_linear(itens, pergunta):
+    # o laço de escolher_resposta antes do índice, com as chaves normalizadas
+    # (e sem variantes repetidas) como o Indice faz na carga
+    pergunta_norm, tokens = engine.normalizar(pergunta)
+    melhor_item = None
+    melhor_pontos = 0
+    for item in itens:
+        pontos = 0
+        for chave in dict.fromkeys(engine.normalizar(c)[0] for c in item.palavras):
+            if " " in chave and chave in pergunta_norm:
+                pontos += 5
+            else:
+                if chave in tokens:
+                    pontos += 1
+        if pontos > melhor_pontos:
+            melhor_pontos = pontos
+            melhor_item = item
+    return melhor_item
+
+# ---------- Medição ----------
+def cronometrar(funcao, argumentos):
+    inicio = time.perf_counter()
+    for a in argumentos:
+        funcao(a)
+    return (time.perf_counter() - inicio) / max(1, len(argumentos))
+
+def memoria(funcao):
+    gc.collect()
+    tracemalloc.start()
+    resultado = funcao()
+    retida, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return resultado, retida, pico
+
+def formatar_tempo(segundos):
+    if segundos >= 1:
+        return f"{segundos:.2f} s"
+    if segundos >= 1e-3:
+        return f"{segundos * 1e3:.1f} ms"
+    return f"{segundos * 1e6:.1f} µs"
+
+def medir(tamanho, n_perguntas, linear, rng):
+    with tempfile.TemporaryDirectory(prefix="motor-") as pasta:
+        caminho = os.path.join(pasta, "sintetica.txt")
+        chaves, palavras, pesos = gerar_base(caminho, tamanho, rng)
+        perguntas = gerar_perguntas(chaves, palavras, pesos, n_perguntas, rng)
+        tamanho_arquivo = os.path.getsize(caminho)
+
+        # a memória é medida antes de tudo: os textos da base são
+        # compartilhados (sys.intern) com qualquer outra cópia já carregada
+        kb, retida, pico = memoria(lambda: engine.KnowledgeBase({"sintetica": caminho}, tamanho_cache=0))
+
+        inicio = time.perf_counter()
+        itens = engine.carregar_arquivo(caminho)
+        t_leitura = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        indice = engine.Indice(itens)
+        t_indice = time.perf_counter() - inicio
+
+        # a varredura linear não corrige erros de digitação: a comparação
+        # usa uma base sem o corretor
+        exata = engine.KnowledgeBase({"sintetica": caminho}, tamanho_cache=0, corrigir=False) if linear else None
+
+    t_normalizar = cronometrar(engine.normalizar, perguntas)
+    t_indexada = cronometrar(kb.escolher, perguntas)
+
+    t_linear = None
+    divergencias = 0
+    if linear:
+        # a varredura fica lenta em bases grandes: mede com menos perguntas
+        amostra = perguntas[:max(5, min(len(perguntas), 200000 // tamanho))]
+        t_linear = cronometrar(lambda p: escolher_linear(indice.itens, p), amostra)
+        for p in amostra:
+            a = escolher_linear(indice.itens, p)
+            b = exata.escolher(p)
+            if (a and a.titulo) != (b and b.titulo):
+                divergencias += 1
+
+    return {
+        "tamanho": tamanho,
+        "arquivo": tamanho_arquivo,
+        "leitura": t_leitura,
+        "indice": t_indice,
+        "normalizar": t_normalizar,
+        "indexada": t_indexada,
+        "linear": t_linear,
+        "divergencias": divergencias,
+        "retida": retida,
+        "pico": pico,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark do motor de respostas.")
+    parser.add_argument("--tamanhos", default="100,1000,10000,100000", help="itens por base, separados por vírgula")
+    parser.add_argument("--perguntas", type=int, default=1000, help="perguntas por base")
+    parser.add_argument("--sem-linear", action="store_true", help="não mede a varredura linear antiga")
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.semente)
+    tamanhos = [int(t) for t in args.tamanhos.split(",") if t.strip()]
+
+    print(f"{'itens':>7s} {'arquivo':>9s} {'leitura':>9s} {'índice':>9s} {'normalizar':>11s} "
+          f"{'escolher':>10s} {'linear':>10s} {'memória':>9s} {'pico':>9s}")
+    for tamanho in tamanhos:
+        r = medir(tamanho, args.perguntas, not args.sem_linear, rng)
+        linear = formatar_tempo(r["linear"]) if r["linear"] is not None else "-"
+        print(f"{r['tamanho']:7d} {r['arquivo'] / 1024:7.0f}KB {formatar_tempo(r['leitura']):>9s} "
+              f"{formatar_tempo(r['indice']):>9s} {formatar_tempo(r['normalizar']):>11s} "
+              f"{formatar_tempo(r['indexada']):>10s} {linear:>10s} "
+              f"{r['retida'] / 2**20:7.1f}MB {r['pico'] / 2**20:7.1f}MB")
+        if r["divergencias"]:
+            print(f"        atenção: {r['divergencias']} pergunta(s) com resposta diferente da varredura linear")
+
+if __name__ == "__main__":
+    main()
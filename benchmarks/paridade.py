@@ -0,0 +1,206 @@
+# Conferência de paridade do motor de respostas (engine.py).
+#
+# As partes reescritas do motor têm de dar exatamente o mesmo resultado
+# que as versões simples que elas substituíram. Este script confere, com
+# arquivos de data/, base.txt e casos aleatórios:
+#   - ler_blocos/carregar_arquivo contra o leitor antigo (readlines);
+#   - AhoCorasick contra a busca ingênua de cada frase com "in";
+#   - Indice (listas em CSR + autômato) contra a pontuação item a item;
+#   - gravar_snapshot/ler_snapshot: a seção lida do arquivo mapeado tem os
+#     mesmos itens, os mesmos arrays e as mesmas respostas que a original.
+# Termina com código 1 se alguma conferência divergir.
+#
+# Uso (na raiz do projeto):
+#     python benchmarks/paridade.py
+#     python benchmarks/paridade.py --casos 20000 --semente 7
+
+import argparse
+import glob
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import engine
+from motor import gerar_base, gerar_perguntas
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def arquivos_reais():
+    return sorted(glob.glob(os.path.join(RAIZ, "data", "*.txt"))) + [
+        c for c in [os.path.join(RAIZ, "base.txt")] if os.path.exists(c)
+    ]
+
+# ---------- Referências ----------
+def carregar_antigo(linhas):
+    # o carregar_arquivo de antes do leitor por linha, sobre uma lista de linhas
+    linhas = [l.strip() for l in linhas if l.strip()]
+    itens = []
+    i = 0
+    while i < len(linhas):
+        if linhas[i].startswith("[") and linhas[i].endswith("]"):
+            if i + 2 < len(linhas):
+                palavras = [p.strip().lower() for p in linhas[i + 1].split(",")]
+                itens.append((linhas[i], tuple(palavras), linhas[i + 2]))
+                i += 3
+            else:
+                i += 1
+        else:
+            i += 1
+    return itens
+
+def buscar_ingenuo(frases, texto):
+    return {i for i, frase in enumerate(frases) if frase in texto}
+
+def chaves_normalizadas(itens):
+    return [{engine.normalizar(c)[0] for c in item.palavras} for item in itens]
+
+def melhor_linear(chaves, pergunta_norm, tokens):
+    # a pontuação item a item, com as regras do Indice; chaves vem de
+    # chaves_normalizadas(), calculadas uma vez por base
+    melhor_pos = None
+    melhor_pontos = 0
+    for pos, chaves_item in enumerate(chaves):
+        pontos = 0
+        for chave in chaves_item:
+            if " " in chave:
+                if chave in pergunta_norm:
+                    pontos += engine.Indice.PONTOS_FRASE
+            elif chave in tokens:
+                pontos += engine.Indice.PONTOS_PALAVRA
+        if pontos > melhor_pontos:
+            melhor_pos = pos
+            melhor_pontos = pontos
+    return melhor_pos, melhor_pontos
+
+def melhor_indice(indice, pergunta_norm, tokens):
+    item, pontos = indice.melhor(pergunta_norm, tokens)
+    if item is None:
+        return None, 0
+    return next(p for p, i in enumerate(indice.itens) if i is item), pontos
+
+def itens_de(entradas):
+    return [(e.titulo, tuple(e.palavras), e.resposta) for e in entradas]
+
+# ---------- Casos aleatórios ----------
+LINHAS_SOLTAS = [
+    "", "   ", "[TITULO]", "  [OUTRO_TITULO]  ", "[", "]", "[]", "[a] b",
+    "# comentário", "#[NAO_E_TITULO]", "missa, horário da missa, Missa ",
+    "batismo,,  , Batismo", "Resposta com [colchetes] no meio.", "Só uma resposta.",
+    "çãõ, ÁÉÍ, água benta", "\t[TAB]\t",
+]
+
+def arquivo_aleatorio(rng):
+    return [rng.choice(LINHAS_SOLTAS) + rng.choice(["\n", "\r\n", ""]) for _ in range(rng.randint(0, 30))]
+
+def frases_aleatorias(rng):
+    alfabeto = "ab c"
+    return list(dict.fromkeys(
+        "".join(rng.choices(alfabeto, k=rng.randint(1, 6))) for _ in range(rng.randint(1, 25))
+    ))
+
+# ---------- Conferências ----------
+def conferir_parser(rng, casos):
+    divergencias = 0
+    for caminho in arquivos_reais():
+        with open(caminho, "r", encoding="utf-8") as f:
+            linhas = f.readlines()
+        if itens_de(engine.carregar_arquivo(caminho)) != carregar_antigo(linhas):
+            print(f"  parser diverge em {os.path.relpath(caminho, RAIZ)}")
+            divergencias += 1
+    for _ in range(casos):
+        linhas = arquivo_aleatorio(rng)
+        if itens_de(engine.ler_blocos(linhas)) != carregar_antigo(linhas):
+            print(f"  parser diverge em {linhas!r}")
+            divergencias += 1
+    return divergencias
+
+def conferir_automato(rng, casos):
+    divergencias = 0
+    for _ in range(casos):
+        frases = frases_aleatorias(rng)
+        automato = engine.AhoCorasick(frases)
+        texto = "".join(rng.choices("ab cd", k=rng.randint(0, 40)))
+        if automato.buscar(texto) != buscar_ingenuo(frases, texto):
+            print(f"  autômato diverge: frases={frases!r} texto={texto!r}")
+            divergencias += 1
+    return divergencias
+
+def conferir_indice(indice, perguntas):
+    divergencias = 0
+    chaves = chaves_normalizadas(indice.itens)
+    for pergunta in perguntas:
+        pergunta_norm, tokens = engine.normalizar(pergunta)
+        if melhor_indice(indice, pergunta_norm, tokens) != melhor_linear(chaves, pergunta_norm, tokens):
+            print(f"  índice diverge em {pergunta!r}")
+            divergencias += 1
+    return divergencias
+
+def conferir_snapshot(secao, perguntas, pasta):
+    caminho = os.path.join(pasta, "secao.pkl")
+    engine.gravar_snapshot(caminho, {"secao": secao})
+    lida = engine.ler_snapshot(caminho)["secao"]
+    original, mapeado = secao["indice"], lida["indice"]
+
+    divergencias = 0
+    if lida["arquivo"] != secao["arquivo"] or lida["avisos"] != secao["avisos"]:
+        divergencias += 1
+    if itens_de(mapeado.itens) != itens_de(original.itens):
+        divergencias += 1
+    if mapeado.termos != original.termos or mapeado.vocabulario != original.vocabulario:
+        divergencias += 1
+    for nome in engine.Indice.ARRAYS:
+        if list(getattr(mapeado, nome)) != list(getattr(original, nome)):
+            divergencias += 1
+    for nome in engine.AhoCorasick.ARRAYS:
+        if list(getattr(mapeado.automato, nome)) != list(getattr(original.automato, nome)):
+            divergencias += 1
+    if mapeado.automato.letras != original.automato.letras:
+        divergencias += 1
+    for pergunta in perguntas:
+        pergunta_norm, tokens = engine.normalizar(pergunta)
+        if melhor_indice(mapeado, pergunta_norm, tokens) != melhor_indice(original, pergunta_norm, tokens):
+            divergencias += 1
+    return divergencias
+
+def main():
+    parser = argparse.ArgumentParser(description="Conferência de paridade do motor de respostas.")
+    parser.add_argument("--casos", type=int, default=5000, help="casos aleatórios por conferência")
+    parser.add_argument("--tamanho", type=int, default=2000, help="itens da base sintética")
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.semente)
+    resultados = []
+
+    resultados.append(("parser", conferir_parser(rng, args.casos)))
+    resultados.append(("aho-corasick", conferir_automato(rng, args.casos)))
+
+    with tempfile.TemporaryDirectory(prefix="paridade-") as pasta:
+        sintetica = os.path.join(pasta, "sintetica.txt")
+        chaves, palavras, pesos = gerar_base(sintetica, args.tamanho, rng)
+        perguntas = gerar_perguntas(chaves, palavras, pesos, args.casos, rng)
+        # as frases-chave de verdade também, para cobrir as de base.txt
+        reais = arquivos_reais()
+        for caminho in reais:
+            for item in engine.carregar_arquivo(caminho):
+                perguntas.extend(rng.sample(item.palavras, min(2, len(item.palavras))))
+
+        indice = 0
+        snapshot = 0
+        for caminho in reais + [sintetica]:
+            secao = engine.indexar_secao(caminho)
+            indice += conferir_indice(secao["indice"], perguntas)
+            snapshot += conferir_snapshot(secao, perguntas, pasta)
+        resultados.append(("índice CSR", indice))
+        resultados.append(("snapshot", snapshot))
+
+    for nome, divergencias in resultados:
+        print(f"{nome:14s} {'ok' if not divergencias else f'{divergencias} divergência(s)'}")
+    if any(divergencias for _, divergencias in resultados):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
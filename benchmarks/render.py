@@ -0,0 +1,73 @@
+# Tempo de renderização por requisição das páginas do site.
+#
+# Compara, para cada template, o jeito antigo (render_template_string com o
+# HTML inteiro, que o Jinja recompila a cada chamada) com render_template
+# (compilado uma vez e guardado em cache), e mede também a requisição
+# completa pelo test client do Flask.
+#
+# Uso (na raiz do projeto):
+#     python benchmarks/render.py [-n 500]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import render_template, render_template_string
+
+import web
+
+HISTORICO = [("ia", web.MENSAGEM_INICIAL)] + [
+    ("user", "Qual o horário da missa?"),
+    ("ia", web.escolher_resposta("Qual o horário da missa?")),
+] * 5
+
+CONTEXTOS = {
+    "chat.html": {"historico": HISTORICO, "versiculo": web.versiculo_do_dia()},
+    "login.html": {"erro": ""},
+    "admin.html": {"usuario": "admin", "perfil": "admin", "cache": web.kb.estatisticas_cache()},
+    "editor.html": {"secoes": web.SECOES},
+    "editor_secao.html": {"secao": "missas", "conteudo": "[MISSA]\nmissa\nResposta.", "mensagem": ""},
+    "historico.html": {"registros": []},
+    "usuarios.html": {"usuarios": [], "mensagem": ""},
+}
+
+PAGINAS = ["/", "/login", "/admin", "/admin/editor", "/admin/editor/editar?secao=missas",
+           "/admin/historico", "/admin/usuarios"]
+
+def cronometrar(funcao, n):
+    for _ in range(min(n, 20)):
+        funcao()
+    inicio = time.perf_counter()
+    for _ in range(n):
+        funcao()
+    return (time.perf_counter() - inicio) / n * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo de renderização das páginas.")
+    parser.add_argument("-n", type=int, default=500, help="repetições por medição")
+    args = parser.parse_args()
+
+    print(f"{'template':22s} {'string (µs)':>12s} {'cache (µs)':>12s} {'ganho':>7s}")
+    with web.app.test_request_context("/"):
+        for nome, contexto in CONTEXTOS.items():
+            fonte = web.app.jinja_env.loader.get_source(web.app.jinja_env, nome)[0]
+            antes = cronometrar(lambda: render_template_string(fonte, **contexto), args.n)
+            depois = cronometrar(lambda: render_template(nome, **contexto), args.n)
+            print(f"{nome:22s} {antes:12.0f} {depois:12.0f} {antes / depois:6.1f}x")
+
+    print()
+    print(f"{'página':40s} {'requisição (µs)':>16s}")
+    cliente = web.app.test_client()
+    with cliente.session_transaction() as sessao:
+        sessao["logado"] = True
+        sessao["usuario"] = "admin"
+        sessao["perfil"] = "admin"
+    for url in PAGINAS:
+        tempo = cronometrar(lambda: cliente.get(url), args.n)
+        print(f"{url:40s} {tempo:16.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1033 @@
+import os
+import unicodedata
+import math
+import mmap
+import hashlib
+import pickle
+import struct
+import sys
+import threading
+import time
+from array import array
+from functools import lru_cache, partial
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# ---------- Config ----------
+STOPWORDS = {
+    "o", "a", "os", "as", "de", "do", "da", "dos", "das", "em", "no", "na", "nos", "nas",
+    "para", "por", "que", "e", "ou", "um", "uma", "como", "é", "ser", "ter", "ao", "aos"
+}
+
+# incrementar sempre que Indice/AhoCorasick mudarem, para invalidar snapshots antigos
+FORMATO_SNAPSHOT = 9
+
+# "palavras": pontuação por palavras/frases-chave (padrão)
+# "bm25": ranking BM25 sobre palavras-chave + texto da resposta
+MODOS_BUSCA = ("palavras", "bm25")
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+BM25_PESO_CHAVES = 2      # um termo nas palavras-chave vale por duas ocorrências na resposta
+# Fração da maior pontuação possível para a pergunta (ver IndiceBM25.maximo)
+# abaixo da qual ela cai na resposta padrão. Relativa, e não em pontos, porque
+# a escala do BM25 muda com o tamanho da base. Calibrado com
+# benchmarks/limiar.py sobre benchmarks/perguntas_rotuladas.txt.
+BM25_LIMIAR = 0.23
+
+SUGESTOES_POR_NO = 8       # quantas sugestões cada nó da trie guarda prontas
+SUGESTOES_VALIDADE = 300   # segundos até recontar as perguntas mais feitas
+
+RESPOSTA_PADRAO = "Ainda não encontrei essa resposta na minha base. Tente perguntar de outro jeito ou fale com a secretaria paroquial."
+
+# ---------- Util ----------
+# Tabela de bytes ASCII: maiúscula -> minúscula, letra/dígito/_ fica como
+# está, o resto (pontuação, símbolos) vira espaço.
+_TABELA_ASCII = bytes(
+    (c + 32 if 65 <= c <= 90 else c) if chr(c).isalnum() or c == 95 else 32
+    for c in range(128)
+) + b" " * 128
+
+_STOPWORDS = frozenset(
+    unicodedata.normalize("NFKD", p).encode("ascii", "ignore").decode("ascii") for p in STOPWORDS
+)
+
+def separar(texto):
+    # Uma passada pelo texto: NFKD separa os acentos das letras ("á" vira
+    # "a" + acento), o encode descarta o que não é ASCII (os acentos) e a
+    # tabela acima faz minúsculas e troca a pontuação por espaço. Letras
+    # fora do alfabeto latino são descartadas; a base é toda em português.
+    if not texto.isascii():
+        texto = unicodedata.normalize("NFKD", texto)
+    return texto.encode("ascii", "ignore").translate(_TABELA_ASCII).decode("ascii").split()
+
+def tokens_de(texto_norm):
+    return [p for p in texto_norm.split() if p not in _STOPWORDS]
+
+def normalizar(texto):
+    # O texto devolvido (palavras sem acento, em minúsculas, separadas por um
+    # espaço) é onde as frases-chave são procuradas; os tokens não têm
+    # stopwords. "Horário" e "horario" viram a mesma coisa.
+    palavras = separar(texto)
+    return " ".join(palavras), [p for p in palavras if p not in _STOPWORDS]
+
+# ---------- Leitura ----------
+class Entrada:
+    # Um bloco da base. Com __slots__ o item não carrega um dicionário, e os
+    # textos passam por sys.intern: palavras-chave repetidas entre itens (e
+    # respostas iguais) viram um único objeto na memória. Nos itens vindos
+    # do snapshot a resposta fica no arquivo mapeado (ver Textos) e só vira
+    # str quando é usada.
+    __slots__ = ("titulo", "palavras", "_resposta")
+
+    def __init__(self, titulo, palavras, resposta):
+        self.titulo = titulo
+        self.palavras = palavras
+        self._resposta = resposta
+
+    @property
+    def resposta(self):
+        resposta = self._resposta
+        if type(resposta) is tuple:
+            textos, i = resposta
+            return textos[i]
+        return resposta
+
+    @property
+    def chave(self):
+        # Identifica o item no histórico: "[TITULO]#hash das palavras-chave".
+        # Só o título não basta (há títulos repetidos na base), e a posição
+        # na seção muda quando alguém insere um bloco acima.
+        h = hashlib.sha256("\n".join(self.palavras).encode("utf-8")).hexdigest()[:8]
+        return f"{self.titulo}#{h}"
+
+def eh_titulo(linha):
+    return linha.startswith("[") and linha.endswith("]")
+
+def ler_blocos(linhas, avisos=None):
+    # Formato de cada bloco (linhas em branco são ignoradas; entre blocos,
+    # linhas começando com # são comentários):
+    # [TITULO]
+    # palavra-chave, outra frase-chave, ...
+    # resposta
+    #
+    # Gerador: lê uma linha por vez e só guarda o bloco em andamento, então
+    # um arquivo grande (o Catecismo inteiro) não fica todo na memória.
+    # avisos: lista opcional onde vão (número da linha, mensagem) dos
+    # trechos que não formam um bloco.
+    titulo = palavras = None
+    inicio = 0
+    for numero, linha in enumerate(linhas, 1):
+        linha = linha.strip()
+        if not linha:
+            continue
+
+        if titulo is None:
+            if eh_titulo(linha):
+                titulo = linha
+                inicio = numero
+            elif avisos is not None and not linha.startswith("#"):
+                avisos.append((numero, "linha fora de um bloco, ignorada (falta o [TITULO] antes dela?)"))
+            continue
+
+        if eh_titulo(linha) and avisos is not None:
+            avisos.append((numero, f"{linha} parece um título, mas está no lugar "
+                                   f"{'das palavras-chave' if palavras is None else 'da resposta'} "
+                                   f"do bloco {titulo} (linha {inicio})"))
+
+        if palavras is None:
+            palavras = tuple(sys.intern(p.strip().lower()) for p in linha.split(","))
+        else:
+            yield Entrada(sys.intern(titulo), palavras, sys.intern(linha))
+            titulo = palavras = None
+
+    if titulo is not None and avisos is not None:
+        falta = "as palavras-chave e a resposta" if palavras is None else "a resposta"
+        avisos.append((inicio, f"bloco {titulo} incompleto no fim do arquivo: falta {falta}"))
+
+def carregar_arquivo(caminho, avisos=None):
+    with open(caminho, "r", encoding="utf-8") as f:
+        return list(ler_blocos(f, avisos))
+
+# ---------- Índice ----------
+class ArraysCompartilhados:
+    # Para classes com arrays grandes. No snapshot cada array listado em
+    # ARRAYS vai como um buffer à parte (pickle protocolo 5), fora do pickle;
+    # ao ler o snapshot mapeado (ver ler_snapshot) eles voltam como
+    # memoryviews sobre o arquivo, somente leitura, e todos os processos
+    # usam as mesmas páginas da memória. Índices e fatias funcionam igual
+    # nos dois casos.
+    ARRAYS = ()
+
+    def __getstate__(self):
+        estado = dict(self.__dict__)
+        for nome in self.ARRAYS:
+            valor = estado[nome]
+            tipo = valor.typecode if isinstance(valor, array) else valor.format
+            estado[nome] = (tipo, pickle.PickleBuffer(valor))
+        return estado
+
+    def __setstate__(self, estado):
+        for nome in self.ARRAYS:
+            tipo, dados = estado[nome]
+            visao = memoryview(dados)
+            if visao.format != tipo:
+                visao = visao.cast(tipo)
+            estado[nome] = visao
+        self.__dict__.update(estado)
+
+class Textos(ArraysCompartilhados):
+    # Vários textos num buffer UTF-8 só: o texto i vai de fim[i - 1] até
+    # fim[i]. É como as respostas vão para o snapshot.
+    ARRAYS = ("dados", "fim")
+
+    def __init__(self, textos):
+        dados = bytearray()
+        self.fim = array("Q")
+        for texto in textos:
+            dados += texto.encode("utf-8")
+            self.fim.append(len(dados))
+        self.dados = memoryview(dados)
+
+    def __getitem__(self, i):
+        return str(self.dados[self.fim[i - 1] if i else 0:self.fim[i]], "utf-8")
+
+class AhoCorasick(ArraysCompartilhados):
+    # Autômato de Aho-Corasick por caractere: encontra, numa única passada
+    # pelo texto, todas as frases (sem repetição) que aparecem como substring.
+    #
+    # Os estados são numerados em largura, então os filhos de cada estado
+    # ficam juntos: os filhos de e são os estados primeiro[e] até
+    # primeiro[e + 1] - 1, e letras[k] é a letra que leva ao estado k. Uma
+    # transição é um letras.find() nessa faixa. Assim o autômato inteiro são
+    # quatro arrays e uma string, em vez de um dicionário e uma lista por
+    # estado (dezenas de bytes por estado em vez de centenas).
+    #   fim[k]: frase que termina em k, ou -1
+    #   falha[k]: estado para onde ir quando a próxima letra não casa
+    #   saida[k]: próximo estado na cadeia de falhas onde termina uma frase
+    ARRAYS = ("primeiro", "fim", "falha", "saida")
+
+    def __init__(self, frases):
+        # trie provisória em dicionários, só durante a montagem
+        trie = [{}]
+        finais = {}
+        for id_frase, frase in enumerate(frases):
+            no = 0
+            for c in frase:
+                prox = trie[no].get(c)
+                if prox is None:
+                    prox = trie[no][c] = len(trie)
+                    trie.append({})
+                no = prox
+            finais[no] = id_frase
+
+        ordem = [0]
+        letras = ["\0"]
+        pais = array("I", [0])
+        primeiro = array("I")
+        for k, velho in enumerate(ordem):
+            primeiro.append(len(ordem))
+            for c, prox in trie[velho].items():
+                ordem.append(prox)
+                letras.append(c)
+                pais.append(k)
+        primeiro.append(len(ordem))
+        del trie
+
+        total = len(ordem)
+        self.letras = letras = "".join(letras)
+        self.primeiro = primeiro
+        self.fim = fim = array("i", [-1]) * total
+        for k, velho in enumerate(ordem):
+            if velho in finais:
+                fim[k] = finais[velho]
+        del ordem, finais
+
+        self.falha = falha = array("I", [0]) * total
+        self.saida = saida = array("I", [0]) * total
+        for k in range(1, total):
+            pai = pais[k]
+            if pai:
+                c = letras[k]
+                f = falha[pai]
+                while True:
+                    j = letras.find(c, primeiro[f], primeiro[f + 1])
+                    if j >= 0 or not f:
+                        break
+                    f = falha[f]
+                falha[k] = max(j, 0)
+            f = falha[k]
+            saida[k] = f if fim[f] >= 0 else saida[f]
+
+    def buscar(self, texto):
+        letras, primeiro, falha, fim, saida = self.letras, self.primeiro, self.falha, self.fim, self.saida
+        encontradas = set()
+        estado = 0
+        for c in texto:
+            while True:
+                j = letras.find(c, primeiro[estado], primeiro[estado + 1])
+                if j >= 0:
+                    estado = j
+                    break
+                if not estado:
+                    break
+                estado = falha[estado]
+            s = estado if fim[estado] >= 0 else saida[estado]
+            while s:
+                encontradas.add(fim[s])
+                s = saida[s]
+        return encontradas
+
+class Indice(ArraysCompartilhados):
+    # Frase-chave (mais de uma palavra) presente na pergunta vale 5 pontos;
+    # palavra-chave solta presente entre os tokens vale 1. As chaves são
+    # normalizadas aqui, uma vez, do mesmo jeito que as perguntas; variantes
+    # que ficam iguais ("horário" e "horario") contam uma vez só por item.
+    #
+    # Como cada chave conta uma vez por item, a lista de um termo é só a das
+    # posições dos itens. As listas ficam todas num array("I") só (formato
+    # CSR): as do termo t são posicoes[inicio[t]:inicio[t + 1]]. Os termos
+    # soltos vêm primeiro, numerados por self.termos; depois as frases, na
+    # ordem do autômato.
+    PONTOS_PALAVRA = 1
+    PONTOS_FRASE = 5
+    ARRAYS = ("inicio", "posicoes")
+
+    def __init__(self, itens):
+        self.itens = itens
+
+        por_token = {}
+        por_frase = {}
+        for pos, item in enumerate(itens):
+            vistas = set()
+            for chave in item.palavras:
+                chave = normalizar(chave)[0]
+                if not chave or chave in vistas:
+                    continue
+                vistas.add(chave)
+                if " " in chave:
+                    por_frase.setdefault(chave, []).append(pos)
+                else:
+                    por_token.setdefault(sys.intern(chave), []).append(pos)
+
+        frases = list(por_frase)
+        # todas as palavras das chaves, para a correção de erros de digitação
+        self.vocabulario = frozenset(por_token).union(*(f.split() for f in frases))
+        self.termos = {t: i for i, t in enumerate(por_token)}
+        self.primeira_frase = len(por_token)
+
+        self.inicio = array("I", [0])
+        self.posicoes = array("I")
+        for lista in list(por_token.values()) + [por_frase[f] for f in frases]:
+            self.posicoes.extend(lista)
+            self.inicio.append(len(self.posicoes))
+        self.automato = AhoCorasick(frases)
+
+    def __getstate__(self):
+        # as respostas vão juntas num Textos, compartilhado pelos processos
+        # junto com os arrays
+        estado = super().__getstate__()
+        textos = Textos(item.resposta for item in self.itens)
+        estado["itens"] = [Entrada(item.titulo, item.palavras, (textos, i))
+                           for i, item in enumerate(self.itens)]
+        return estado
+
+    def pontuar(self, pergunta_norm, tokens):
+        pontuacao = {}
+        inicio = self.inicio
+        posicoes = self.posicoes
+
+        for token in set(tokens):
+            t = self.termos.get(token)
+            if t is not None:
+                for pos in posicoes[inicio[t]:inicio[t + 1]]:
+                    pontuacao[pos] = pontuacao.get(pos, 0) + self.PONTOS_PALAVRA
+
+        for id_frase in self.automato.buscar(pergunta_norm):
+            t = self.primeira_frase + id_frase
+            for pos in posicoes[inicio[t]:inicio[t + 1]]:
+                pontuacao[pos] = pontuacao.get(pos, 0) + self.PONTOS_FRASE
+
+        return pontuacao
+
+    def melhor(self, pergunta_norm, tokens):
+        pontuacao = self.pontuar(pergunta_norm, tokens)
+        if not pontuacao:
+            return None, 0
+        # maior pontuação vence; no empate, o primeiro item da base
+        pos = min(pontuacao, key=lambda p: (-pontuacao[p], p))
+        return self.itens[pos], pontuacao[pos]
+
+class IndiceBM25:
+    # Matriz esparsa termo x item com os pesos BM25 já calculados, guardada
+    # como CSR (indptr/indices/dados). Pontuar uma pergunta é multiplicar a
+    # matriz pelo vetor (binário) dos termos da pergunta: junta as linhas dos
+    # termos presentes e soma por item. Com NumPy isso é um np.bincount; sem
+    # ele, um laço sobre as mesmas linhas.
+    #
+    # Só concorrem os itens com alguma palavra-chave inteira na pergunta (todas
+    # as palavras dela, em qualquer ordem). Palavras da resposta e pedaços de
+    # frases-chave ajudam a ordenar, mas sozinhos não bastam: "onde fica o
+    # estacionamento" não é sobre "onde fica jesus" ([SACRARIO]).
+    def __init__(self, itens):
+        self.itens = itens
+
+        # cada chave fica na lista de uma das suas palavras (a menor), com as
+        # outras palavras que também têm de estar na pergunta
+        self.chaves = {}
+        documentos = []
+        for doc, item in enumerate(itens):
+            termos = {}
+            for chave in {normalizar(chave)[0] for chave in item.palavras}:
+                tokens = set(tokens_de(chave))
+                if tokens:
+                    primeira = min(tokens)
+                    self.chaves.setdefault(primeira, []).append((doc, frozenset(tokens - {primeira})))
+                for t in tokens_de(chave):
+                    termos[t] = termos.get(t, 0) + BM25_PESO_CHAVES
+            for t in normalizar(item.resposta)[1]:
+                termos[t] = termos.get(t, 0) + 1
+            documentos.append(termos)
+
+        total = len(documentos)
+        tamanhos = [sum(termos.values()) for termos in documentos]
+        media = sum(tamanhos) / total if total else 0
+
+        por_termo = {}
+        for doc, termos in enumerate(documentos):
+            norma = BM25_K1 * (1 - BM25_B + BM25_B * tamanhos[doc] / media) if media else BM25_K1
+            for t, tf in termos.items():
+                por_termo.setdefault(t, []).append((doc, tf * (BM25_K1 + 1) / (tf + norma)))
+
+        self.vocabulario = {}
+        self.idf = array("d")
+        # idf de um termo que não aparece em item nenhum
+        self.idf_ausente = math.log(1 + (total + 0.5) / 0.5)
+        indptr = array("L", [0])
+        indices = array("L")
+        dados = array("d")
+        for t, lista in por_termo.items():
+            idf = math.log(1 + (total - len(lista) + 0.5) / (len(lista) + 0.5))
+            self.vocabulario[t] = len(self.vocabulario)
+            self.idf.append(idf)
+            for doc, peso in lista:
+                indices.append(doc)
+                dados.append(idf * peso)
+            indptr.append(len(indices))
+
+        self.indptr = indptr
+        if np is not None:
+            self.indices = np.asarray(indices, dtype=np.intp)
+            self.dados = np.asarray(dados, dtype=np.float64)
+        else:
+            self.indices = indices
+            self.dados = dados
+
+    def candidatos(self, tokens):
+        # os itens com alguma palavra-chave inteira entre os tokens, em ordem
+        presentes = set(tokens)
+        docs = set()
+        for t in presentes:
+            for doc, resto in self.chaves.get(t, ()):
+                if resto <= presentes:
+                    docs.add(doc)
+        return sorted(docs)
+
+    def melhor(self, tokens):
+        candidatos = self.candidatos(tokens)
+        linhas = sorted({self.vocabulario[t] for t in tokens if t in self.vocabulario})
+        if not linhas or not candidatos:
+            return None, 0
+
+        if np is not None:
+            fatias = [slice(self.indptr[l], self.indptr[l + 1]) for l in linhas]
+            pontos = np.bincount(
+                np.concatenate([self.indices[f] for f in fatias]),
+                weights=np.concatenate([self.dados[f] for f in fatias]),
+                minlength=len(self.itens),
+            )
+            # argmax devolve o primeiro máximo: no empate vence o item que vem antes
+            candidatos = np.asarray(candidatos)
+            doc = int(candidatos[np.argmax(pontos[candidatos])])
+            return self.itens[doc], float(pontos[doc])
+
+        pontos = {}
+        for l in linhas:
+            for i in range(self.indptr[l], self.indptr[l + 1]):
+                doc = self.indices[i]
+                pontos[doc] = pontos.get(doc, 0.0) + self.dados[i]
+        doc = min(candidatos, key=lambda d: (-pontos.get(d, 0.0), d))
+        return self.itens[doc], pontos.get(doc, 0.0)
+
+    def maximo(self, tokens):
+        # Teto da pontuação da pergunta: cada termo, no máximo, vale
+        # idf * (k1 + 1). Palavras fora da base entram com o maior idf: uma
+        # pergunta de outro assunto que por acaso tem uma palavra da base
+        # fica com fração baixa.
+        vocabulario = self.vocabulario
+        return sum(
+            self.idf[vocabulario[t]] if t in vocabulario else self.idf_ausente
+            for t in set(tokens)
+        ) * (BM25_K1 + 1)
+
+# ---------- Correção de digitação ----------
+def trigramas(palavra):
+    palavra = f"^{palavra}$"
+    return {palavra[i:i + 3] for i in range(len(palavra) - 2)}
+
+def distancia(a, b, limite):
+    # Distância de edição (inserção, remoção, troca e inversão de duas letras
+    # vizinhas) que desiste assim que passa do limite: devolve limite + 1.
+    if abs(len(a) - len(b)) > limite:
+        return limite + 1
+    anterior2 = None
+    anterior = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        atual = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            custo = 0 if ca == cb else 1
+            atual[j] = min(anterior[j] + 1, atual[j - 1] + 1, anterior[j - 1] + custo)
+            if anterior2 is not None and i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                atual[j] = min(atual[j], anterior2[j - 2] + 1)
+        if min(atual) > limite:
+            return limite + 1
+        anterior2, anterior = anterior, atual
+    return anterior[-1]
+
+def erros_tolerados(palavra):
+    # palavras curtas não são corrigidas: "nome" e "nove", "gato" e "ato"
+    # estão a uma letra
+    if len(palavra) < 5:
+        return 0
+    if len(palavra) < 8:
+        return 1
+    return 2
+
+def parte_corretor(vocabulario):
+    # (vocabulário, {trigrama: [palavras]}) de um pedaço da base (uma seção).
+    # O vocabulário tem as stopwords de dentro das frases-chave ("missa de
+    # domingo"), mas elas não viram sugestão: "quem" viraria "que".
+    por_trigrama = {}
+    for palavra in sorted(vocabulario):
+        if len(palavra) >= 3 and palavra not in _STOPWORDS:
+            for t in trigramas(palavra):
+                por_trigrama.setdefault(t, []).append(palavra)
+    return vocabulario, por_trigrama
+
+class Corretor:
+    # Troca palavras desconhecidas da pergunta pela palavra-chave mais
+    # parecida. Um índice invertido de trigramas (com ^ e $ nas pontas)
+    # escolhe poucos candidatos; a distância de edição só é calculada para
+    # eles, nunca para o vocabulário inteiro.
+    # partes: lista de parte_corretor(), uma por seção. Cada parte é montada
+    # uma vez: quando uma seção muda, só a dela é refeita.
+    def __init__(self, partes):
+        self.partes = partes
+
+    def conhece(self, palavra):
+        for vocabulario, _ in self.partes:
+            if palavra in vocabulario:
+                return True
+        return False
+
+    def sugerir(self, palavra):
+        limite = erros_tolerados(palavra)
+        if not limite:
+            return None
+        proprios = trigramas(palavra)
+        # uma palavra que está em duas seções tem a mesma contagem nas duas:
+        # conta em cada parte e junta sem somar
+        comuns = {}
+        for _, por_trigrama in self.partes:
+            deste = {}
+            for t in proprios:
+                for candidata in por_trigrama.get(t, ()):
+                    deste[candidata] = deste.get(candidata, 0) + 1
+            comuns.update(deste)
+
+        # Vence a menor distância; no empate, mais trigramas em comum, depois
+        # a ordem alfabética. As candidatas vão nessa ordem de desempate, então
+        # depois de achar uma com distância d só interessa quem tiver menos
+        # que d: o limite cai e as contas param mais cedo.
+        melhor = None
+        for candidata, n in sorted(comuns.items(), key=lambda c: (-c[1], c[0])):
+            # cada erro estraga no máximo quatro trigramas (a inversão de duas
+            # letras vizinhas; as outras edições, três)
+            if n < len(proprios) - 4 * limite:
+                break
+            d = distancia(palavra, candidata, limite)
+            if d <= limite:
+                melhor = candidata
+                limite = d - 1
+                if limite < 1:
+                    break
+        return melhor
+
+    def corrigir(self, pergunta_norm):
+        palavras = pergunta_norm.split()
+        mudou = False
+        for i, palavra in enumerate(palavras):
+            if palavra in _STOPWORDS or self.conhece(palavra):
+                continue
+            sugestao = self.sugerir(palavra)
+            if sugestao:
+                palavras[i] = sugestao
+                mudou = True
+        if not mudou:
+            return pergunta_norm
+        return " ".join(palavras)
+
+# ---------- Sugestões ----------
+class Autocompletar:
+    # Trie de prefixos sobre as frases-chave (normalizadas). Cada nó é
+    # [filhos, melhores], e "melhores" já traz as SUGESTOES_POR_NO frases mais
+    # perguntadas abaixo dele: responder um prefixo é descer um nó por letra
+    # e copiar essa lista. A frase entra na trie também a partir de cada
+    # palavra que não é stopword, para que "missa" sugira "horário da missa".
+    def __init__(self, frases, perguntas=()):
+        # frases: {texto normalizado: texto para mostrar}
+        # perguntas: pares (pergunta, quantas vezes foi feita), para ordenar
+        pesos = self.contar(list(frases), perguntas)
+        ordem = sorted(frases, key=lambda f: (-pesos.get(f, 0), len(f), f))
+        self.textos = [frases[f] for f in ordem]
+        self.raiz = [{}, []]
+
+        # inseridas da mais perguntada para a menos: cada nó fica com as
+        # primeiras que passarem por ele e a ordem já sai pronta
+        for id_frase, frase in enumerate(ordem):
+            inicio = 0
+            for palavra in frase.split(" "):
+                if inicio == 0 or palavra not in _STOPWORDS:
+                    no = self.raiz
+                    for c in frase[inicio:]:
+                        filho = no[0].get(c)
+                        if filho is None:
+                            filho = no[0][c] = [{}, []]
+                        no = filho
+                        melhores = no[1]
+                        # o mesmo nó pode ser alcançado por dois inícios da frase
+                        if len(melhores) < SUGESTOES_POR_NO and (not melhores or melhores[-1] != id_frase):
+                            melhores.append(id_frase)
+                inicio += len(palavra) + 1
+
+    @staticmethod
+    def contar(frases, perguntas):
+        # quantas perguntas do histórico contêm cada frase (palavras inteiras)
+        pesos = {}
+        automato = None
+        for pergunta, vezes in perguntas:
+            if automato is None:
+                automato = AhoCorasick([f" {f} " for f in frases])
+            for id_frase in automato.buscar(f" {normalizar(pergunta)[0]} "):
+                pesos[frases[id_frase]] = pesos.get(frases[id_frase], 0) + vezes
+        return pesos
+
+    def buscar(self, texto, limite=SUGESTOES_POR_NO):
+        # Tenta o texto inteiro e depois o que vem a partir de cada palavra
+        # ("quero saber o horario da mi" chega em "horario da mi").
+        palavras = separar(texto)
+        encontradas = []
+        for i in range(len(palavras)):
+            no = self.raiz
+            for c in " ".join(palavras[i:]):
+                no = no[0].get(c)
+                if no is None:
+                    break
+            if no is None or no is self.raiz:
+                continue
+            for id_frase in no[1]:
+                if id_frase not in encontradas:
+                    encontradas.append(id_frase)
+            if len(encontradas) >= limite:
+                break
+        return [self.textos[i] for i in encontradas[:limite]]
+
+# ---------- Snapshot ----------
+# Arquivo do snapshot: cabeçalho, o pickle e depois os buffers dos arrays
+# (ArraysCompartilhados), cada um alinhado em 8 bytes para ser usado direto
+# do mmap.
+#   cabeçalho: MAGICA, tamanho do pickle, número de buffers
+#              e, para cada buffer, (início, tamanho)
+MAGICA = b"PSJBASE1"
+_CABECALHO = struct.Struct("<8sQQ")
+_BUFFER = struct.Struct("<QQ")
+
+def gravar_snapshot(caminho, dados):
+    buffers = []
+    corpo = pickle.dumps(dados, protocol=5, buffer_callback=buffers.append)
+    buffers = [b.raw() for b in buffers]
+
+    posicao = _CABECALHO.size + _BUFFER.size * len(buffers) + len(corpo)
+    tabela = []
+    for b in buffers:
+        posicao += -posicao % 8
+        tabela.append((posicao, b.nbytes))
+        posicao += b.nbytes
+
+    # grava num temporário e troca de uma vez: quem já mapeou o arquivo
+    # antigo continua com ele até largar os índices
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, "wb") as f:
+        f.write(_CABECALHO.pack(MAGICA, len(corpo), len(buffers)))
+        for inicio, tamanho in tabela:
+            f.write(_BUFFER.pack(inicio, tamanho))
+        f.write(corpo)
+        for (inicio, _), b in zip(tabela, buffers):
+            f.write(b"\0" * (inicio - f.tell()))
+            f.write(b)
+    os.replace(temporario, caminho)
+
+def ler_snapshot(caminho):
+    # Mapeia o arquivo só para leitura. Os memoryviews dos arrays seguram o
+    # mapa aberto enquanto os índices estiverem em uso.
+    with open(caminho, "rb") as f:
+        mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magica, tamanho, quantos = _CABECALHO.unpack_from(mapa, 0)
+    if magica != MAGICA:
+        mapa.close()
+        raise ValueError("snapshot em formato desconhecido")
+    inicio = _CABECALHO.size
+    tabela = [_BUFFER.unpack_from(mapa, inicio + i * _BUFFER.size) for i in range(quantos)]
+    inicio += _BUFFER.size * quantos
+    visao = memoryview(mapa)
+    buffers = [visao[a:a + n] for a, n in tabela]
+    return pickle.loads(visao[inicio:inicio + tamanho], buffers=buffers)
+
+def estado_arquivo(caminho):
+    try:
+        st = os.stat(caminho)
+    except FileNotFoundError:
+        return None
+    return (caminho, st.st_mtime_ns, st.st_size)
+
+def hash_arquivo(caminho):
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(partial(f.read, 1 << 16), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+def indexar_secao(caminho):
+    # Cada seção tem o seu próprio índice: salvar uma seção só relê e
+    # reindexa aquele arquivo. O estado do arquivo é lido antes do conteúdo:
+    # se alguém salvar no meio da leitura, a próxima verificação percebe.
+    # Os avisos da leitura ficam junto, para o editor mostrar.
+    estado = estado_arquivo(caminho)
+    if estado is None:
+        return {"arquivo": None, "indice": Indice([]), "avisos": []}
+    avisos = []
+    indice = Indice(carregar_arquivo(caminho, avisos))
+    return {"arquivo": estado + (hash_arquivo(caminho),), "indice": indice, "avisos": avisos}
+
+def secao_em_dia(secao, caminho):
+    # compara primeiro mtime/tamanho; só calcula o hash quando o mtime mudou
+    gravado = secao["arquivo"]
+    atual = estado_arquivo(caminho)
+    if gravado is None or atual is None:
+        return gravado == atual
+    if gravado[:3] == atual:
+        return True
+    if gravado[2] != atual[2] or gravado[3] != hash_arquivo(caminho):
+        return False
+    # mesmo conteúdo com outro mtime (arquivo copiado ou salvo sem mudanças)
+    secao["arquivo"] = atual + (gravado[3],)
+    return True
+
+# ---------- Base de conhecimento ----------
+class KnowledgeBase:
+    def __init__(self, secoes, snapshot=None, geracao=None, tamanho_cache=1024, modo="palavras",
+                 corrigir=True, frequencias=None, limiar_bm25=BM25_LIMIAR):
+        # secoes: {"nome": "caminho/do/arquivo.txt"}, lidas na ordem do dicionário
+        # snapshot: pasta com a base já lida e indexada, um arquivo por seção
+        #           (opcional)
+        # geracao: arquivo tocado a cada alteração, para avisar os outros
+        #          processos que a base mudou (opcional)
+        # tamanho_cache: quantas perguntas distintas guardar já respondidas
+        # modo: um de MODOS_BUSCA
+        # corrigir: tolera erros de digitação nas palavras da pergunta
+        # frequencias: função que devolve pares (pergunta, vezes) para ordenar
+        #              as sugestões de autocompletar (opcional)
+        # limiar_bm25: no modo "bm25", fração mínima da pontuação possível
+        #              (ver BM25_LIMIAR)
+        if modo not in MODOS_BUSCA:
+            raise ValueError(f"Modo de busca inválido: {modo!r} (use um de {', '.join(MODOS_BUSCA)})")
+        self.modo = modo
+        self.limiar_bm25 = limiar_bm25
+        self.corrigir = corrigir
+        self.frequencias = frequencias
+        self.secoes = dict(secoes)
+        self.snapshot = snapshot
+        self.geracao = geracao
+        self.tamanho_cache = tamanho_cache
+        self.indices = {}
+        self._escolher_cache = None
+        self._acertos = 0
+        self._erros = 0
+        self._marca_geracao = None
+        self._partes_corretor = {}
+        self._trava = threading.Lock()
+        self._sugestoes = None
+        self._trava_sugestoes = threading.Lock()
+        self.carregar()
+
+    @property
+    def base(self):
+        indices = self.indices
+        return [item for nome in self.secoes for item in indices[nome]["indice"].itens]
+
+    def carregar(self):
+        # cada seção vem do snapshot quando ele está em dia, senão do arquivo
+        self._marca_geracao = self._ler_marca()
+        self.indices = {}
+        self._reindexar(self.secoes)
+
+    def compilar(self):
+        # relê e reindexa todas as seções, sem usar o snapshot
+        with self._trava:
+            self._trocar({nome: self._indexar(nome) for nome in self.secoes})
+
+    def atualizar(self):
+        # Chamado a cada requisição: com o arquivo de geração, custa um stat()
+        # quando nada mudou. Só as seções alteradas são lidas de novo.
+        if self.geracao:
+            marca = self._ler_marca()
+            if marca == self._marca_geracao:
+                return False
+
+        # outra thread já está atualizando: segue com os índices atuais
+        if not self._trava.acquire(blocking=False):
+            return False
+        try:
+            if self.geracao:
+                self._marca_geracao = marca
+            # quem publicou já gravou o snapshot da seção: _reindexar só o mapeia
+            return self._reindexar(self.secoes)
+        finally:
+            self._trava.release()
+
+    def publicar(self, secao=None):
+        # Avisa todos os processos que a base mudou. Quem salvou informa a
+        # seção, que é reindexada aqui mesmo sem conferir as outras. O
+        # snapshot é gravado antes de a geração mudar: os outros processos
+        # já encontram o arquivo novo pronto.
+        with self._trava:
+            if secao is None:
+                self._reindexar(self.secoes)
+            else:
+                self._reindexar([secao])
+
+            if self.geracao:
+                try:
+                    with open(self.geracao, "r", encoding="utf-8") as f:
+                        numero = int(f.read().strip() or 0)
+                except (OSError, ValueError):
+                    numero = 0
+                temporario = f"{self.geracao}.{os.getpid()}.tmp"
+                with open(temporario, "w", encoding="utf-8") as f:
+                    f.write(str(numero + 1))
+                os.replace(temporario, self.geracao)
+            self._marca_geracao = self._ler_marca()
+
+    def _reindexar(self, nomes):
+        indices = dict(self.indices)
+        mudou = False
+        for nome in nomes:
+            caminho = self.secoes[nome]
+            if nome in indices and secao_em_dia(indices[nome], caminho):
+                continue
+            indices[nome] = self._ler_secao(nome) or self._indexar(nome)
+            mudou = True
+        if mudou:
+            self._trocar(indices)
+        return mudou
+
+    def _indexar(self, nome):
+        # Lê e indexa a seção. Com snapshot, grava o arquivo dela e passa a
+        # usar a versão mapeada: os arrays ficam numa cópia só, compartilhada
+        # com os outros processos que mapearem o mesmo arquivo.
+        secao = indexar_secao(self.secoes[nome])
+        if not self.snapshot:
+            return secao
+        self._gravar_secao(nome, secao)
+        return self._ler_secao(nome) or secao
+
+    def _ler_marca(self):
+        if not self.geracao:
+            return None
+        try:
+            st = os.stat(self.geracao)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _trocar(self, indices):
+        # O cache de respostas pertence aos índices com que foi criado: base
+        # nova, cache novo. Quem estiver respondendo nesse momento continua
+        # usando os índices (e o cache) antigos até terminar.
+        if self.modo == "bm25":
+            # o BM25 precisa do idf da base inteira, então é um índice único
+            # montado a partir das seções (rápido: não relê arquivo nenhum)
+            itens = [item for nome in self.secoes for item in indices[nome]["indice"].itens]
+            indice = IndiceBM25(itens)
+            corretor = Corretor([parte_corretor(indice.vocabulario)]) if self.corrigir else None
+            escolher = partial(self._escolher_bm25, indice)
+        else:
+            # um corretor só, com as palavras de todas as seções; a parte de
+            # cada seção é reaproveitada enquanto o índice dela não mudar
+            corretor = None
+            if self.corrigir:
+                partes = {}
+                for nome in self.secoes:
+                    indice = indices[nome]["indice"]
+                    guardada = self._partes_corretor.get(nome)
+                    if guardada is None or guardada[0] is not indice:
+                        guardada = (indice, parte_corretor(indice.vocabulario))
+                    partes[nome] = guardada
+                self._partes_corretor = partes
+                corretor = Corretor([parte for _, parte in partes.values()])
+            escolher = partial(self._escolher_em, indices)
+        if corretor:
+            escolher = partial(self._escolher_corrigindo, escolher, corretor)
+        escolher = lru_cache(maxsize=self.tamanho_cache)(escolher)
+        antigo = self._escolher_cache
+        if antigo is not None:
+            info = antigo.cache_info()
+            self._acertos += info.hits
+            self._erros += info.misses
+        self._escolher_cache = escolher
+        self.indices = indices
+
+    def _arquivo_secao(self, nome):
+        return os.path.join(self.snapshot, f"{nome}.pkl")
+
+    def _ler_secao(self, nome):
+        # A seção do snapshot, mapeada, se estiver em dia com o arquivo dela;
+        # senão None.
+        if not self.snapshot:
+            return None
+        try:
+            dados = ler_snapshot(self._arquivo_secao(nome))
+        except Exception:
+            return None
+        caminho = self.secoes[nome]
+        if dados.get("formato") != FORMATO_SNAPSHOT or dados.get("caminho") != caminho:
+            return None
+        secao = dados["secao"]
+        antes = secao["arquivo"]
+        if not secao_em_dia(secao, caminho):
+            return None
+        if secao["arquivo"] != antes:
+            # mesmo conteúdo com outro mtime: grava o estado novo para não
+            # calcular o hash de novo na próxima vez
+            self._gravar_secao(nome, secao)
+        return secao
+
+    def _gravar_secao(self, nome, secao):
+        os.makedirs(self.snapshot, exist_ok=True)
+        gravar_snapshot(self._arquivo_secao(nome),
+                        {"formato": FORMATO_SNAPSHOT, "caminho": self.secoes[nome], "secao": secao})
+
+    def avisos(self, secao):
+        # [(número da linha, mensagem)] da última leitura da seção
+        return self.indices[secao]["avisos"]
+
+    def estatisticas_cache(self):
+        info = self._escolher_cache.cache_info()
+        return {
+            "acertos": self._acertos + info.hits,
+            "erros": self._erros + info.misses,
+            "tamanho": info.currsize,
+            "maximo": info.maxsize,
+        }
+
+    def escolher(self, pergunta):
+        return self.avaliar(pergunta)[0]
+
+    def avaliar(self, pergunta):
+        # Devolve (item, pontuação); item é None quando a pergunta fica com a
+        # resposta padrão (a pontuação diz o quanto chegou perto).
+        # A chave do cache é o texto normalizado, não só a tupla de tokens:
+        # as frases-chave são procuradas nele com stopwords, então duas
+        # perguntas com os mesmos tokens podem ter respostas diferentes. Os
+        # tokens só são separados depois, quando a pergunta não está no cache.
+        pergunta_norm = " ".join(separar(pergunta))
+        return self._escolher_cache(pergunta_norm)
+
+    def _escolher_corrigindo(self, escolher, corretor, pergunta_norm):
+        # A pergunta vai primeiro como veio; a correção de digitação só entra
+        # quando ela ficaria com a resposta padrão. Uma palavra bem escrita
+        # que só não está na base ("quanto") não vira a palavra-chave
+        # parecida ("quando") numa pergunta que já tinha resposta, nem leva
+        # uma pergunta de outro assunto a uma resposta qualquer.
+        item, pontos = escolher(pergunta_norm)
+        if item is None:
+            corrigida = corretor.corrigir(pergunta_norm)
+            if corrigida != pergunta_norm:
+                return escolher(corrigida)
+        return item, pontos
+
+    def _escolher_em(self, indices, pergunta_norm):
+        tokens = tokens_de(pergunta_norm)
+
+        # a melhor de cada seção; no empate vale a seção que vem primeiro,
+        # o mesmo resultado de um índice único sobre a base inteira
+        melhor_item = None
+        melhor_pontos = 0
+        for nome in self.secoes:
+            indice = indices[nome]["indice"]
+            if not indice.itens:
+                continue
+            item, pontos = indice.melhor(pergunta_norm, tokens)
+            if pontos > melhor_pontos:
+                melhor_item = item
+                melhor_pontos = pontos
+        return melhor_item, melhor_pontos
+
+    def _escolher_bm25(self, indice, pergunta_norm):
+        # a pontuação devolvida é a fração de indice.maximo, de 0 a 1
+        tokens = tokens_de(pergunta_norm)
+        item, pontos = indice.melhor(tokens)
+        if pontos:
+            pontos /= indice.maximo(tokens)
+        if pontos < self.limiar_bm25:
+            return None, pontos
+        return item, pontos
+
+    def sugerir(self, texto, limite=SUGESTOES_POR_NO):
+        # A trie é montada na primeira chamada e refeita quando a base muda ou
+        # as contagens ficam velhas. Enquanto uma thread refaz, as outras
+        # seguem respondendo com a trie anterior.
+        atual = self._sugestoes
+        if atual is None or atual[0] is not self.indices or time.monotonic() - atual[1] > SUGESTOES_VALIDADE:
+            if self._trava_sugestoes.acquire(blocking=atual is None):
+                try:
+                    atual = self._montar_sugestoes()
+                finally:
+                    self._trava_sugestoes.release()
+        return atual[2].buscar(texto, limite)
+
+    def _montar_sugestoes(self):
+        indices = self.indices
+        frases = {}
+        for nome in self.secoes:
+            for item in indices[nome]["indice"].itens:
+                for chave in item.palavras:
+                    norm = normalizar(chave)[0]
+                    if not tokens_de(norm):
+                        continue
+                    # entre "horario" e "horário", mostra a grafia com acento
+                    if norm not in frases or len(chave.encode()) > len(frases[norm].encode()):
+                        frases[norm] = chave
+        perguntas = self.frequencias() if self.frequencias else ()
+        atual = (indices, time.monotonic(), Autocompletar(frases, perguntas))
+        self._sugestoes = atual
+        return atual
+
+    def responder(self, pergunta):
+        item = self.escolher(pergunta)
+        if item:
+            return item.resposta
+        return RESPOSTA_PADRAO
@@ -0,0 +1,211 @@
+# Arquivos estáticos compilados.
+#
+# Os originais ficam em static/ como sempre. compilar() gera em static/build/:
+#   - os logos na altura em que aparecem na página (1x e 2x), em WebP e PNG;
+#   - o favicon, feito a partir do logo da paróquia;
+#   - o CSS e o JS com cópias já comprimidas (.gz e, com o módulo brotli, .br).
+# Cada arquivo gerado leva no nome o hash do conteúdo ("chat.1a2b3c4d5e.css"),
+# então o navegador pode guardá-lo para sempre: quando o original muda, o
+# nome muda junto. O manifesto diz qual nome gerado corresponde a cada um.
+#
+# Pillow e brotli são opcionais (pip install Pillow brotli). Sem Pillow as
+# imagens vão com o tamanho original (só ganham o hash no nome); sem brotli,
+# só o .gz. Instalar um deles depois faz a próxima compilação refazer tudo.
+#
+# web.py compila na partida, e só refaz o que for preciso quando algum
+# original mudou. Para compilar à mão:
+#     python estaticos.py
+
+import gzip
+import hashlib
+import io
+import json
+import os
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# ---------- Config ----------
+ORIGEM = "static"
+DESTINO = os.path.join("static", "build")
+MANIFESTO = "manifesto.json"
+FORMATO_MANIFESTO = 2
+
+# logos e a altura (px) com que aparecem nas páginas
+LOGOS = {
+    "logo_paroquia.png": 90,
+    "logo_pascom.png": 90,
+}
+DENSIDADES = (1, 2)
+QUALIDADE_WEBP = 85
+
+FAVICON = "logo_paroquia.png"
+FAVICON_TAMANHOS = (16, 32, 48)
+
+# textos servidos também comprimidos
+TEXTOS = ("css/chat.css", "js/chat.js")
+
+# ---------- Util ----------
+def gravar_arquivo(caminho, dados):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, "wb") as f:
+        f.write(dados)
+    os.replace(temporario, caminho)
+
+def gravar_com_hash(destino, nome, dados):
+    # "css/chat.css" -> "css/chat.1a2b3c4d5e.css"; devolve o nome gerado
+    base, extensao = os.path.splitext(nome)
+    final = f"{base}.{hashlib.sha256(dados).hexdigest()[:10]}{extensao}"
+    caminho = os.path.join(destino, final)
+    if not os.path.exists(caminho):
+        gravar_arquivo(caminho, dados)
+    return final
+
+def ler(origem, nome):
+    with open(os.path.join(origem, nome), "rb") as f:
+        return f.read()
+
+# ---------- Imagens ----------
+def redimensionar(imagem, altura, formato):
+    largura = max(1, round(imagem.width * altura / imagem.height))
+    menor = imagem.resize((largura, altura), Image.LANCZOS)
+    saida = io.BytesIO()
+    if formato == "webp":
+        menor.save(saida, "WEBP", quality=QUALIDADE_WEBP, method=6)
+    else:
+        menor.save(saida, "PNG", optimize=True)
+    return saida.getvalue()
+
+def gerar_favicon(imagem):
+    # centraliza num quadrado transparente antes de reduzir
+    lado = max(imagem.size)
+    quadrado = Image.new("RGBA", (lado, lado))
+    quadrado.paste(imagem, ((lado - imagem.width) // 2, (lado - imagem.height) // 2))
+    saida = io.BytesIO()
+    quadrado.save(saida, "ICO", sizes=[(t, t) for t in FAVICON_TAMANHOS])
+    return saida.getvalue()
+
+def abrir_imagem(dados):
+    imagem = Image.open(io.BytesIO(dados))
+    return imagem.convert("RGBA")
+
+# ---------- Compilação ----------
+def estado_fontes(origem):
+    estado = {}
+    for nome in sorted(set(LOGOS) | {FAVICON} | set(TEXTOS)):
+        try:
+            st = os.stat(os.path.join(origem, nome))
+        except FileNotFoundError:
+            continue
+        estado[nome] = [st.st_mtime_ns, st.st_size]
+    return estado
+
+def ler_manifesto(destino):
+    try:
+        with open(os.path.join(destino, MANIFESTO), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def compilar(origem=ORIGEM, destino=DESTINO, forcar=False):
+    # Devolve o manifesto:
+    #   {"arquivos": {nome: nome gerado}, "versao": hash de todos eles, ...}
+    # Os nomes são relativos a origem e a destino. Os logos redimensionados
+    # aparecem como "logo_paroquia-90.webp", "logo_paroquia-180.png" etc.
+    ferramentas = {"pillow": Image is not None, "brotli": brotli is not None}
+    fontes = estado_fontes(origem)
+    antigo = ler_manifesto(destino)
+    if (not forcar and antigo and antigo.get("formato") == FORMATO_MANIFESTO
+            and antigo.get("fontes") == fontes and antigo.get("ferramentas") == ferramentas):
+        return antigo
+
+    arquivos = {}
+    for nome in TEXTOS:
+        if nome not in fontes:
+            continue
+        dados = ler(origem, nome)
+        final = gravar_com_hash(destino, nome, dados)
+        caminho = os.path.join(destino, final)
+        gravar_arquivo(caminho + ".gz", gzip.compress(dados, compresslevel=9, mtime=0))
+        if brotli is not None:
+            gravar_arquivo(caminho + ".br", brotli.compress(dados, mode=brotli.MODE_TEXT))
+        arquivos[nome] = final
+
+    for nome, altura in LOGOS.items():
+        if nome not in fontes:
+            continue
+        dados = ler(origem, nome)
+        if Image is None:
+            # sem Pillow vai o original mesmo, ao menos com cache longo
+            arquivos[nome] = gravar_com_hash(destino, nome, dados)
+            continue
+        imagem = abrir_imagem(dados)
+        base = os.path.splitext(nome)[0]
+        for densidade in DENSIDADES:
+            for formato in ("webp", "png"):
+                variante = f"{base}-{altura * densidade}.{formato}"
+                arquivos[variante] = gravar_com_hash(destino, variante,
+                                                     redimensionar(imagem, altura * densidade, formato))
+
+    if Image is not None and FAVICON in fontes:
+        arquivos["favicon.ico"] = gravar_com_hash(destino, "favicon.ico",
+                                                  gerar_favicon(abrir_imagem(ler(origem, FAVICON))))
+
+    # A geração anterior fica: num reinício escalonado, os workers antigos
+    # ainda servem páginas que apontam para ela. Se nada mudou (compilação
+    # forçada), a anterior continua a mesma de antes.
+    if antigo and set((antigo.get("arquivos") or {}).values()) != set(arquivos.values()):
+        anteriores = sorted(set(antigo["arquivos"].values()))
+    else:
+        anteriores = (antigo or {}).get("anteriores", [])
+
+    versao = hashlib.sha256(json.dumps(arquivos, sort_keys=True).encode("utf-8")).hexdigest()[:10]
+    manifesto = {
+        "formato": FORMATO_MANIFESTO,
+        "fontes": fontes,
+        "ferramentas": ferramentas,
+        "versao": versao,
+        "arquivos": arquivos,
+        "anteriores": anteriores,
+    }
+    gravar_arquivo(os.path.join(destino, MANIFESTO),
+                   json.dumps(manifesto, indent=1, sort_keys=True).encode("utf-8"))
+    apagar_antigos(destino, list(arquivos.values()) + anteriores)
+    return manifesto
+
+def apagar_antigos(destino, finais):
+    # Os nomes gerados antes (de originais que mudaram) ficam para trás a
+    # cada compilação: apaga o que não está em finais (a geração nova e a
+    # anterior). Os .tmp são de outro processo gravando agora e ficam.
+    manter = {MANIFESTO}
+    for final in finais:
+        manter.update((final, final + ".gz", final + ".br"))
+    for pasta, _, nomes in os.walk(destino):
+        for nome in nomes:
+            caminho = os.path.join(pasta, nome)
+            relativo = os.path.relpath(caminho, destino).replace(os.sep, "/")
+            if relativo in manter or nome.endswith(".tmp"):
+                continue
+            try:
+                os.remove(caminho)
+            except FileNotFoundError:
+                pass
+
+# ---------- Run ----------
+if __name__ == "__main__":
+    manifesto = compilar(forcar=True)
+    for nome, final in sorted(manifesto["arquivos"].items()):
+        tamanho = os.path.getsize(os.path.join(DESTINO, final))
+        print(f"{nome:28s} {final:44s} {tamanho / 1024:8.1f} KB")
+    if Image is None:
+        print("Pillow não instalado: imagens copiadas sem redimensionar.")
+    if brotli is None:
+        print("brotli não instalado: só as cópias .gz.")
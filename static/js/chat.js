@@ -0,0 +1,112 @@
+// Envia as perguntas para /api/perguntar e acrescenta só a resposta nova
+// na conversa, sem recarregar a página. Sem fetch (navegador antigo) ou sem
+// JavaScript, o formulário segue o caminho normal (POST para "/"). Se o
+// envio falhar, o balão da resposta mostra um aviso para tentar de novo: a
+// pergunta não é reenviada sozinha, porque pode já ter sido respondida e
+// gravada no servidor.
+(function () {
+    var caixa = document.querySelector(".chat-box");
+    if (!caixa || !window.fetch) {
+        return;
+    }
+
+    function adicionarMensagem(autor, texto) {
+        var msg = document.createElement("div");
+        msg.className = "msg " + autor;
+        var balao = document.createElement("div");
+        balao.className = "balao";
+        balao.textContent = texto;
+        msg.appendChild(balao);
+        caixa.appendChild(msg);
+        caixa.scrollTop = caixa.scrollHeight;
+        return balao;
+    }
+
+    function enviar(form) {
+        var campo = form.querySelector("[name=pergunta]");
+        var pergunta = campo.value.trim();
+        if (!pergunta) {
+            return;
+        }
+        if (campo.type !== "hidden") {
+            campo.value = "";
+        }
+
+        adicionarMensagem("user", pergunta);
+        var balao = adicionarMensagem("ia", "…");
+
+        fetch("/api/perguntar", {
+            method: "POST",
+            headers: {"Content-Type": "application/json"},
+            credentials: "same-origin",
+            body: JSON.stringify({pergunta: pergunta})
+        }).then(function (resp) {
+            if (!resp.ok) {
+                throw new Error(resp.status);
+            }
+            return resp.json();
+        }).then(function (dados) {
+            balao.textContent = dados.resposta;
+            caixa.scrollTop = caixa.scrollHeight;
+        }).catch(function () {
+            balao.textContent = "Não consegui enviar sua pergunta. Tente de novo.";
+        });
+    }
+
+    document.querySelectorAll("form").forEach(function (form) {
+        if (!form.querySelector("[name=pergunta]")) {
+            return;
+        }
+        form.addEventListener("submit", function (evento) {
+            evento.preventDefault();
+            enviar(form);
+        });
+    });
+
+    // Autocompletar: a cada tecla (com uma pequena pausa) busca em
+    // /api/sugestoes as frases-chave que combinam com o texto digitado e
+    // preenche o <datalist> ligado ao campo.
+    function sugerir(campo, lista) {
+        var espera = null;
+        var ultimo = "";
+        campo.addEventListener("input", function () {
+            clearTimeout(espera);
+            espera = setTimeout(function () {
+                var texto = campo.value.trim();
+                if (texto === ultimo) {
+                    return;
+                }
+                ultimo = texto;
+                if (!texto) {
+                    lista.textContent = "";
+                    return;
+                }
+                fetch("/api/sugestoes?q=" + encodeURIComponent(texto), {credentials: "same-origin"})
+                    .then(function (resp) {
+                        return resp.ok ? resp.json() : {sugestoes: []};
+                    })
+                    .then(function (dados) {
+                        if (texto !== ultimo) {
+                            return;   // já chegou outra tecla
+                        }
+                        lista.textContent = "";
+                        dados.sugestoes.forEach(function (frase) {
+                            var opcao = document.createElement("option");
+                            opcao.value = frase;
+                            lista.appendChild(opcao);
+                        });
+                    })
+                    .catch(function () {});
+            }, 80);
+        });
+    }
+
+    var lista = document.getElementById("sugestoes");
+    if (lista) {
+        document.querySelectorAll("input[list=sugestoes]").forEach(function (campo) {
+            sugerir(campo, lista);
+        });
+    }
+
+    caixa.scrollTop = caixa.scrollHeight;
+})();
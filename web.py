@@ -1,21 +1,119 @@
-from flask import Flask, request, render_template_string, session, redirect, url_for
-import re
+from flask import Flask, request, render_template, session, redirect, url_for, jsonify, send_from_directory, make_response
+import gzip
+import hashlib
+import mimetypes
 import os
 import random
-from datetime import date, datetime
+import secrets
+import atexit
+import queue
+import threading
+import time
+from datetime import date, datetime, timedelta
 import sqlite3
+from werkzeug.exceptions import BadRequest
 from werkzeug.security import generate_password_hash, check_password_hash
 
+from engine import KnowledgeBase, RESPOSTA_PADRAO, BM25_LIMIAR, normalizar
+import estaticos
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 DB_PATH = "paroquia.db"
+DB_POOL_TAMANHO = 8       # conexões ociosas mantidas abertas por processo
+DB_ESPERA = 5             # segundos esperando o lock de escrita antes de desistir
+DB_ESPERA_INICIO = 300    # idem na criação/migração do banco (init_db), que pode demorar
+CONVERSA_LIMITE = 40      # mensagens guardadas (e mostradas) por conversa
+CONVERSA_VALIDADE = 7     # dias sem uso até a conversa ser apagada
+CONVERSA_LIMPEZA = 3600   # segundos entre as limpezas das conversas vencidas
+
+# ---------- Conexões ----------
+# get_db() entrega uma conexão já aberta do pool do processo e conn.close()
+# a devolve para lá. Abrir a conexão, ligar o WAL e preparar os comandos SQL
+# (cached_statements) acontece uma vez por conexão, não por requisição. Com
+# WAL, quem lê o histórico não bloqueia o chat que grava.
+class ConexaoPool(sqlite3.Connection):
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+        if not self.pool.devolver(self):
+            super().close()
+
+class PoolConexoes:
+    def __init__(self, caminho, tamanho):
+        self.caminho = caminho
+        self.tamanho = tamanho
+        self._livres = []
+        self._pid = os.getpid()
+        self._trava = threading.Lock()
+
+    def pegar(self):
+        with self._trava:
+            # depois de um fork (gunicorn --preload) não reaproveita as conexões do pai
+            if self._pid != os.getpid():
+                self._livres = []
+                self._pid = os.getpid()
+            if self._livres:
+                return self._livres.pop()
+        return self._abrir()
+
+    def devolver(self, conn):
+        with self._trava:
+            if self._pid == os.getpid() and len(self._livres) < self.tamanho:
+                self._livres.append(conn)
+                return True
+        return False
+
+    def _abrir(self):
+        conn = sqlite3.connect(
+            self.caminho,
+            timeout=DB_ESPERA,
+            check_same_thread=False,
+            cached_statements=256,
+            factory=ConexaoPool,
+        )
+        conn.pool = self
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+pool_db = PoolConexoes(DB_PATH, DB_POOL_TAMANHO)
 
 def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return pool_db.pegar()
 
 def init_db():
+    # Vários workers sobem ao mesmo tempo (asgi.py, gunicorn) e todos chamam
+    # init_db. Criação e migração do esquema vão numa transação só, com a
+    # trava de escrita pega logo no começo (BEGIN IMMEDIATE): os outros
+    # esperam e, quando entram, as verificações (table_info, sqlite_master)
+    # já veem o esquema pronto. Ninguém adiciona a mesma coluna nem monta o
+    # resumo duas vezes.
     conn = get_db()
-
+    conn.execute(f"PRAGMA busy_timeout = {DB_ESPERA_INICIO * 1000}")
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            criar_esquema(conn)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    finally:
+        conn.execute(f"PRAGMA busy_timeout = {DB_ESPERA * 1000}")
+        conn.close()
+
+def apagar_conversas_vencidas(conn):
+    # na partida (init_db) e depois a cada CONVERSA_LIMPEZA, pelo gravador
+    limite = (datetime.now() - timedelta(days=CONVERSA_VALIDADE)).strftime("%Y-%m-%d %H:%M:%S")
+    conn.execute("DELETE FROM mensagens WHERE data_hora < ?", (limite,))
+
+def criar_esquema(conn):
+    # dentro da transação de init_db: nada aqui faz commit
     conn.execute("""
         CREATE TABLE IF NOT EXISTS usuarios (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -30,9 +128,35 @@ def init_db():
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             data_hora TEXT,
             pergunta TEXT,
-            resposta TEXT
+            resposta TEXT,
+            pontuacao REAL,
+            entrada TEXT
+        )
+    """)
+    # bancos criados antes de pontuacao/entrada (Entrada.chave do item que respondeu)
+    colunas = {c["name"] for c in conn.execute("PRAGMA table_info(historico)")}
+    for coluna, tipo in (("pontuacao", "REAL"), ("entrada", "TEXT")):
+        if coluna not in colunas:
+            conn.execute(f"ALTER TABLE historico ADD COLUMN {coluna} {tipo}")
+    # paginação e filtro por data em /admin/historico
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_historico_data_hora ON historico (data_hora, id)")
+    criar_busca_historico(conn)
+    criar_resumo_historico(conn)
+
+    # conversas do chat; o cookie da sessão guarda só o id da conversa
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS mensagens (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            conversa TEXT NOT NULL,
+            data_hora TEXT,
+            autor TEXT,
+            texto TEXT
         )
     """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_mensagens_conversa ON mensagens (conversa, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_mensagens_data_hora ON mensagens (data_hora)")
+
+    apagar_conversas_vencidas(conn)
 
     # cria usuários iniciais se a tabela estiver vazia
     cur = conn.execute("SELECT COUNT(*) as total FROM usuarios")
@@ -51,9 +175,136 @@ def init_db():
                 "INSERT INTO usuarios (usuario, senha_hash, perfil) VALUES (?, ?, ?)",
                 u
             )
-        conn.commit()
 
-    conn.close()
+# Busca de texto do histórico: índice FTS5 que aponta para as linhas de
+# historico (content=historico, sem guardar o texto duas vezes), mantido por
+# triggers. Se o SQLite não tiver FTS5, a busca cai para LIKE.
+HISTORICO_FTS = False
+
+def criar_busca_historico(conn):
+    global HISTORICO_FTS
+    existia = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'historico_busca'"
+    ).fetchone()
+    # savepoint: sem FTS5 desfaz só esta parte, não a transação de init_db
+    conn.execute("SAVEPOINT busca_historico")
+    try:
+        for comando in (
+            """CREATE VIRTUAL TABLE IF NOT EXISTS historico_busca USING fts5(
+                pergunta, resposta, content='historico', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )""",
+            """CREATE TRIGGER IF NOT EXISTS historico_busca_ai AFTER INSERT ON historico BEGIN
+                INSERT INTO historico_busca (rowid, pergunta, resposta)
+                VALUES (new.id, new.pergunta, new.resposta);
+            END""",
+            """CREATE TRIGGER IF NOT EXISTS historico_busca_ad AFTER DELETE ON historico BEGIN
+                INSERT INTO historico_busca (historico_busca, rowid, pergunta, resposta)
+                VALUES ('delete', old.id, old.pergunta, old.resposta);
+            END""",
+            """CREATE TRIGGER IF NOT EXISTS historico_busca_au AFTER UPDATE ON historico BEGIN
+                INSERT INTO historico_busca (historico_busca, rowid, pergunta, resposta)
+                VALUES ('delete', old.id, old.pergunta, old.resposta);
+                INSERT INTO historico_busca (rowid, pergunta, resposta)
+                VALUES (new.id, new.pergunta, new.resposta);
+            END""",
+        ):
+            conn.execute(comando)
+        if not existia:
+            # tabela nova num banco que já tinha histórico: indexa o que existe
+            conn.execute("INSERT INTO historico_busca (historico_busca) VALUES ('rebuild')")
+        HISTORICO_FTS = True
+    except sqlite3.OperationalError:
+        conn.execute("ROLLBACK TO busca_historico")
+        HISTORICO_FTS = False
+    conn.execute("RELEASE busca_historico")
+
+# Resumo do histórico para /admin/estatisticas, por dia e por semana (que
+# começa na segunda-feira): quantas vezes cada pergunta foi feita, separando
+# as respondidas das que ficaram com a resposta padrão, e os totais de cada
+# período. O gravador do histórico soma cada lote aqui, na mesma transação,
+# e o painel só lê as primeiras linhas do índice, sem GROUP BY no histórico.
+# As perguntas são agrupadas pelo texto normalizado.
+def criar_resumo_historico(conn):
+    existia = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'resumo_perguntas'"
+    ).fetchone()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS resumo_perguntas (
+            periodo TEXT NOT NULL,
+            inicio TEXT NOT NULL,
+            respondida INTEGER NOT NULL,
+            chave TEXT NOT NULL,
+            pergunta TEXT,
+            entrada TEXT,
+            vezes INTEGER NOT NULL,
+            PRIMARY KEY (periodo, inicio, respondida, chave)
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_resumo_perguntas_vezes
+            ON resumo_perguntas (periodo, inicio, respondida, vezes)
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS resumo_totais (
+            periodo TEXT NOT NULL,
+            inicio TEXT NOT NULL,
+            respondidas INTEGER NOT NULL,
+            sem_resposta INTEGER NOT NULL,
+            PRIMARY KEY (periodo, inicio)
+        )
+    """)
+    if not existia:
+        # banco que já tinha histórico: monta o resumo uma vez, a partir da
+        # resposta gravada (as linhas antigas não têm a entrada)
+        cur = conn.execute(
+            "SELECT data_hora, pergunta, resposta != ?, entrada FROM historico WHERE data_hora IS NOT NULL",
+            (RESPOSTA_PADRAO,)
+        )
+        while True:
+            linhas = cur.fetchmany(5000)
+            if not linhas:
+                break
+            somar_resumo(conn, linhas)
+
+def inicios_periodo(data_hora):
+    dia = date.fromisoformat(data_hora[:10])
+    return (("dia", dia.isoformat()), ("semana", (dia - timedelta(days=dia.weekday())).isoformat()))
+
+def somar_resumo(conn, linhas):
+    # linhas: (data_hora, pergunta, respondida, entrada). Soma o lote em
+    # memória antes, para fazer um upsert por pergunta distinta.
+    perguntas = {}
+    totais = {}
+    for data_hora, pergunta, respondida, entrada in linhas:
+        respondida = 1 if respondida else 0
+        chave = normalizar(pergunta or "")[0]
+        for periodo, inicio in inicios_periodo(data_hora):
+            total = totais.setdefault((periodo, inicio), [0, 0])
+            total[1 - respondida] += 1
+            if not chave:
+                continue
+            atual = perguntas.get((periodo, inicio, respondida, chave))
+            if atual is None:
+                perguntas[(periodo, inicio, respondida, chave)] = [pergunta, entrada, 1]
+            else:
+                atual[1] = entrada or atual[1]
+                atual[2] += 1
+
+    conn.executemany("""
+        INSERT INTO resumo_perguntas (periodo, inicio, respondida, chave, pergunta, entrada, vezes)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (periodo, inicio, respondida, chave) DO UPDATE SET
+            vezes = vezes + excluded.vezes,
+            entrada = COALESCE(excluded.entrada, entrada)
+    """, [chave + tuple(valores) for chave, valores in perguntas.items()])
+    conn.executemany("""
+        INSERT INTO resumo_totais (periodo, inicio, respondidas, sem_resposta)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (periodo, inicio) DO UPDATE SET
+            respondidas = respondidas + excluded.respondidas,
+            sem_resposta = sem_resposta + excluded.sem_resposta
+    """, [chave + tuple(valores) for chave, valores in totais.items()])
 
 init_db()
 
@@ -67,25 +318,321 @@ def get_usuario(usuario):
 def verificar_senha(senha_digitada, senha_hash_banco):
     return check_password_hash(senha_hash_banco, senha_digitada)
 
-def salvar_historico(pergunta, resposta):
+# ---------- Histórico ----------
+# As perguntas do chat não são gravadas na requisição: vão para uma fila e
+# uma thread grava em lote, numa única transação, a cada HISTORICO_LOTE
+# linhas ou HISTORICO_INTERVALO segundos (o que vier primeiro).
+HISTORICO_LOTE = 100
+HISTORICO_INTERVALO = 0.5
+
+class GravadorHistorico:
+    PARAR = object()
+
+    def __init__(self, lote, intervalo):
+        self.lote = lote
+        self.intervalo = intervalo
+        self.fila = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._trava = threading.Lock()
+
+    def adicionar(self, linha):
+        self._iniciar()
+        self.fila.put(linha)
+
+    def descarregar(self):
+        # espera tudo o que já está na fila chegar ao banco
+        if self._pid == os.getpid():
+            self.fila.join()
+
+    def encerrar(self):
+        if self._pid == os.getpid() and self._thread.is_alive():
+            self.fila.put(self.PARAR)
+            self._thread.join(timeout=10)
+
+    def _iniciar(self):
+        # Com gunicorn --preload o módulo é importado antes do fork: a thread
+        # (e a fila) são criadas no processo que de fato recebe as perguntas.
+        if self._pid == os.getpid():
+            return
+        with self._trava:
+            if self._pid == os.getpid():
+                return
+            self.fila = queue.Queue()
+            self._limpeza = time.monotonic()
+            self._thread = threading.Thread(target=self._rodar, name="gravador-historico", daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def _rodar(self):
+        while True:
+            try:
+                # acorda de tempos em tempos mesmo sem perguntas, para a limpeza
+                linhas = [self.fila.get(timeout=CONVERSA_LIMPEZA)]
+            except queue.Empty:
+                self._limpar_conversas()
+                continue
+            prazo = time.monotonic() + self.intervalo
+            while len(linhas) < self.lote and linhas[-1] is not self.PARAR:
+                restante = prazo - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    linhas.append(self.fila.get(timeout=restante))
+                except queue.Empty:
+                    break
+
+            parar = linhas[-1] is self.PARAR
+            if parar:
+                linhas.pop()
+            try:
+                if linhas:
+                    self._gravar(linhas)
+            except Exception:
+                # qualquer erro perde só este lote: se a thread morresse, o
+                # histórico pararia e descarregar() esperaria para sempre
+                app.logger.exception("Falha ao gravar %d linha(s) do histórico", len(linhas))
+            finally:
+                for _ in range(len(linhas) + parar):
+                    self.fila.task_done()
+            if parar:
+                return
+            self._limpar_conversas()
+
+    def _limpar_conversas(self):
+        # Um worker pode ficar meses no ar: as conversas vencidas são
+        # apagadas aqui também, não só na partida. Quem responde não espera
+        # por isso (a fila já foi liberada acima).
+        if time.monotonic() - self._limpeza < CONVERSA_LIMPEZA:
+            return
+        self._limpeza = time.monotonic()
+        try:
+            conn = get_db()
+            try:
+                with conn:
+                    apagar_conversas_vencidas(conn)
+            finally:
+                conn.close()
+        except Exception:
+            app.logger.exception("Falha ao apagar as conversas vencidas")
+
+    def _gravar(self, linhas):
+        # linhas: as colunas de historico e, por último, se foi respondida
+        conn = get_db()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO historico (data_hora, pergunta, resposta, pontuacao, entrada) VALUES (?, ?, ?, ?, ?)",
+                    [l[:5] for l in linhas]
+                )
+                somar_resumo(conn, [(l[0], l[1], l[5], l[4]) for l in linhas])
+        finally:
+            conn.close()
+
+gravador_historico = GravadorHistorico(HISTORICO_LOTE, HISTORICO_INTERVALO)
+atexit.register(gravador_historico.encerrar)
+
+def salvar_historico(pergunta, resposta, respondida, pontuacao=None, entrada=None):
+    # respondida: algum item da base respondeu (False na resposta padrão)
+    # entrada: Entrada.chave desse item
+    gravador_historico.adicionar(
+        (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), pergunta, resposta, pontuacao, entrada, respondida)
+    )
+
+HISTORICO_POR_PAGINA = 50
+
+def buscar_historico(texto="", de=None, ate=None, antes=None, limite=HISTORICO_POR_PAGINA):
+    # Paginação por chave em vez de OFFSET: cada página continua da linha
+    # "antes" (o id da última mostrada), sem reler as linhas já mostradas.
+    # Devolve uma linha a mais que o limite quando existe próxima página.
+    #
+    # Sem busca, a ordem é (data_hora, id), do mais novo para o mais antigo, e
+    # tanto o filtro de datas quanto a página seguinte são faixas do índice
+    # idx_historico_data_hora (data_hora, id).
+    #
+    # Na busca pelo FTS, a ordem é a do rowid (o id, ordem de chegada): o FTS
+    # entrega os resultados já nessa ordem e a consulta para ao encher a
+    # página. Ordenar por data_hora obrigaria a ler e ordenar todos os
+    # resultados de um termo comum a cada página. As datas só filtram.
+    conn = get_db()
+    try:
+        # toda linha gravada tem data_hora; ">= ''" também deixa as nulas de fora
+        condicoes = ["h.data_hora >= ?"]
+        parametros = [de.isoformat() if de else ""]
+        if ate and ate < date.max:
+            condicoes.append("h.data_hora < ?")
+            parametros.append((ate + timedelta(days=1)).isoformat())
+
+        termos = texto.split()
+        if termos and HISTORICO_FTS:
+            # cada palavra entre aspas (ninguém digita sintaxe do FTS) e como
+            # prefixo: "batis" acha "batismo"
+            origem = "historico_busca b JOIN historico h ON h.id = b.rowid"
+            ordem = "b.rowid DESC"
+            condicoes.insert(0, "historico_busca MATCH ?")
+            parametros.insert(0, " ".join('"' + t.replace('"', '""') + '"*' for t in termos))
+            if antes is not None:
+                condicoes.append("b.rowid < ?")
+                parametros.append(antes)
+        else:
+            origem = "historico h"
+            ordem = "h.data_hora DESC, h.id DESC"
+            for t in termos:
+                condicoes.append("(h.pergunta LIKE ? OR h.resposta LIKE ?)")
+                parametros.extend([f"%{t}%"] * 2)
+            if antes is not None:
+                linha = conn.execute("SELECT data_hora FROM historico WHERE id = ?", (antes,)).fetchone()
+                if not linha or linha[0] is None:
+                    return []
+                condicoes.append("(h.data_hora, h.id) < (?, ?)")
+                parametros.extend([linha[0], antes])
+
+        parametros.append(limite + 1)
+        return conn.execute(f"""
+            SELECT h.id, h.data_hora, h.pergunta, h.resposta FROM {origem}
+            WHERE {" AND ".join(condicoes)}
+            ORDER BY {ordem} LIMIT ?
+        """, parametros).fetchall()
+    finally:
+        conn.close()
+
+# perguntas recentes usadas para ordenar as sugestões do autocompletar
+SUGESTOES_HISTORICO = 5000
+
+def frequencias_historico():
+    conn = get_db()
+    linhas = conn.execute("""
+        SELECT pergunta, COUNT(*) FROM (
+            SELECT pergunta FROM historico ORDER BY id DESC LIMIT ?
+        ) GROUP BY pergunta
+    """, (SUGESTOES_HISTORICO,)).fetchall()
+    conn.close()
+    return linhas
+
+# ---------- Conversas ----------
+def nova_conversa():
+    session.pop("historico", None)   # cookies antigos guardavam a conversa inteira
+    session["conversa"] = secrets.token_urlsafe(16)
+    return session["conversa"]
+
+def carregar_conversa(conversa):
     conn = get_db()
-    conn.execute(
-        "INSERT INTO historico (data_hora, pergunta, resposta) VALUES (?, ?, ?)",
-        (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), pergunta, resposta)
+    cur = conn.execute(
+        "SELECT autor, texto FROM mensagens WHERE conversa = ? ORDER BY id DESC LIMIT ?",
+        (conversa, CONVERSA_LIMITE)
     )
-    conn.commit()
+    mensagens = [(m["autor"], m["texto"]) for m in cur.fetchall()]
+    conn.close()
+    mensagens.reverse()
+    return [("ia", MENSAGEM_INICIAL)] + mensagens
+
+def adicionar_mensagens(conversa, mensagens):
+    agora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    conn = get_db()
+    with conn:
+        conn.executemany(
+            "INSERT INTO mensagens (conversa, data_hora, autor, texto) VALUES (?, ?, ?, ?)",
+            [(conversa, agora, autor, texto) for autor, texto in mensagens]
+        )
+        # mantém só as últimas CONVERSA_LIMITE mensagens da conversa
+        conn.execute("""
+            DELETE FROM mensagens WHERE conversa = ? AND id <= (
+                SELECT id FROM mensagens WHERE conversa = ? ORDER BY id DESC LIMIT 1 OFFSET ?
+            )
+        """, (conversa, conversa, CONVERSA_LIMITE))
+    conn.close()
+
+def limpar_conversa(conversa):
+    conn = get_db()
+    with conn:
+        conn.execute("DELETE FROM mensagens WHERE conversa = ?", (conversa,))
     conn.close()
 
 
 
 # ---------- Config ----------
-STOPWORDS = {
-    "o", "a", "os", "as", "de", "do", "da", "dos", "das", "em", "no", "na", "nos", "nas",
-    "para", "por", "que", "e", "ou", "um", "uma", "como", "é", "ser", "ter", "ao", "aos"
-}
-
 app = Flask(__name__)
 app.secret_key = os.environ.get("SECRET_KEY", "paroquia-secret-key")
+# corpo máximo das requisições (413 acima disso); o editor envia a seção
+# inteira, e uma seção pode ser o Catecismo todo
+app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024
+
+# ---------- Arquivos estáticos ----------
+# Logos redimensionados, favicon e CSS/JS comprimidos, com o hash do conteúdo
+# no nome (ver estaticos.py). Refeitos na partida só se algum original mudou.
+ESTATICOS = estaticos.compilar()
+ESTATICOS_VALIDADE = 365 * 24 * 3600
+
+def estatico(nome):
+    # endereço do arquivo compilado; sem ele (não gerado), o original de static/
+    final = ESTATICOS["arquivos"].get(nome)
+    if final is None:
+        return f"/static/{nome}"
+    return f"/static/build/{final}"
+
+# nos templates: {{ estatico("css/chat.css") }} e a macro logo de _logo.html
+app.jinja_env.globals.update(estatico=estatico, estaticos=ESTATICOS["arquivos"])
+
+@app.route("/static/build/<path:nome>")
+def estatico_compilado(nome):
+    # O nome muda junto com o conteúdo: o navegador guarda por um ano sem
+    # perguntar de novo. Quando há cópia já comprimida que o navegador
+    # aceita, vai ela. O manifesto (datas e tamanhos dos originais) não é
+    # para fora.
+    if nome == estaticos.MANIFESTO:
+        return "Arquivo não encontrado", 404
+    pasta = os.path.abspath(estaticos.DESTINO)
+    tipo = mimetypes.guess_type(nome)[0]
+    for codificacao, extensao in (("br", ".br"), ("gzip", ".gz")):
+        if aceita_codificacao(codificacao) and os.path.isfile(os.path.join(pasta, nome + extensao)):
+            resposta = send_from_directory(pasta, nome + extensao, mimetype=tipo, max_age=ESTATICOS_VALIDADE)
+            resposta.headers["Content-Encoding"] = codificacao
+            break
+    else:
+        resposta = send_from_directory(pasta, nome, max_age=ESTATICOS_VALIDADE)
+    resposta.cache_control.immutable = True
+    resposta.vary.add("Accept-Encoding")
+    return resposta
+
+# ---------- Compressão ----------
+# HTML e JSON gerados a cada requisição vão comprimidos (brotli se o módulo
+# estiver instalado e o navegador aceitar, senão gzip). Respostas pequenas
+# não compensam o trabalho. Os arquivos de static/ não passam por aqui:
+# os compilados já têm cópia comprimida e as imagens não encolhem.
+COMPRIMIR_MINIMO = 1024     # bytes
+COMPRIMIR_TIPOS = {"text/html", "text/plain", "text/css", "text/javascript", "application/json"}
+BROTLI_QUALIDADE = 5        # 0-11: acima disso custa muito mais CPU e quase não diminui
+GZIP_NIVEL = 6
+
+def aceita_codificacao(codificacao):
+    # "gzip;q=0" quer dizer que não aceita
+    return request.accept_encodings[codificacao] > 0
+
+@app.after_request
+def comprimir_resposta(resposta):
+    if resposta.mimetype not in COMPRIMIR_TIPOS or resposta.direct_passthrough or resposta.is_streamed:
+        return resposta
+    resposta.vary.add("Accept-Encoding")
+    if resposta.status_code != 200 or "Content-Encoding" in resposta.headers:
+        return resposta
+    dados = resposta.get_data()
+    if len(dados) < COMPRIMIR_MINIMO:
+        return resposta
+
+    if brotli is not None and aceita_codificacao("br"):
+        resposta.set_data(brotli.compress(dados, quality=BROTLI_QUALIDADE))
+        resposta.headers["Content-Encoding"] = "br"
+    elif aceita_codificacao("gzip"):
+        resposta.set_data(gzip.compress(dados, compresslevel=GZIP_NIVEL, mtime=0))
+        resposta.headers["Content-Encoding"] = "gzip"
+    else:
+        return resposta
+
+    # os bytes mudaram: a ETag passa a fraca (mesmo conteúdo, outra forma)
+    etag, fraca = resposta.get_etag()
+    if etag and not fraca:
+        resposta.set_etag(etag, weak=True)
+    return resposta
 
 # ---------- Usuários ----------
 USUARIOS = {
@@ -137,186 +684,28 @@ SECOES = {
     "cic": "data/cic.txt",
 }
 
-def carregar_base():
-    base = []
-    for _, caminho in SECOES.items():
-        if not os.path.exists(caminho):
-            continue
+# pasta com a base já lida e indexada, um arquivo por seção; cada um é refeito
+# sozinho quando o arquivo da seção muda
+BASE_COMPILADA = "base_compilada"
+# tocado a cada edição; os workers conferem o stat dele a cada requisição
+GERACAO_BASE = "data/.geracao"
 
-        with open(caminho, "r", encoding="utf-8") as f:
-            linhas = [l.strip() for l in f.readlines() if l.strip()]
-
-        i = 0
-        while i < len(linhas):
-            if linhas[i].startswith("[") and linhas[i].endswith("]"):
-                if i + 2 < len(linhas):
-                    palavras = [p.strip().lower() for p in linhas[i + 1].split(",")]
-                    resposta = linhas[i + 2]
-                    base.append({"palavras": palavras, "resposta": resposta})
-                    i += 3
-                else:
-                    i += 1
-            else:
-                i += 1
-    return base
+# "palavras" (padrão) ou "bm25"; ver engine.MODOS_BUSCA
+MODO_BUSCA = os.environ.get("MODO_BUSCA", "palavras")
+# no modo bm25: fração da pontuação possível abaixo da qual vai a resposta padrão
+LIMIAR_BM25 = float(os.environ.get("BM25_LIMIAR", BM25_LIMIAR))
 
-base = carregar_base()
+kb = KnowledgeBase(SECOES, snapshot=BASE_COMPILADA, geracao=GERACAO_BASE, modo=MODO_BUSCA,
+                   limiar_bm25=LIMIAR_BM25, frequencias=frequencias_historico)
 
-# ---------- Util ----------
-def normalizar(texto):
-    texto = texto.lower()
-    texto = re.sub(r"[^\w\sáéíóúâêôãõç]", " ", texto)
-    palavras = texto.split()
-    palavras = [p for p in palavras if p not in STOPWORDS]
-    return texto, palavras
+@app.before_request
+def atualizar_base():
+    kb.atualizar()
 
 def escolher_resposta(pergunta):
-    pergunta_norm, tokens = normalizar(pergunta)
-
-    melhor_item = None
-    melhor_pontos = 0
-
-    for item in base:
-        pontos = 0
-        for chave in item["palavras"]:
-            chave = chave.lower()
-            if len(chave.split()) > 1 and chave in pergunta_norm:
-                pontos += 5
-            else:
-                if chave in tokens:
-                    pontos += 1
-
-        if pontos > melhor_pontos:
-            melhor_pontos = pontos
-            melhor_item = item
-
-    if melhor_item and melhor_pontos > 0:
-        return melhor_item["resposta"]
-    else:
-        return "Ainda não encontrei essa resposta na minha base. Tente perguntar de outro jeito ou fale com a secretaria paroquial."
-
-# ---------- HTML ----------
-HTML = """
-<!DOCTYPE html>
-<html>
-<head>
-<meta charset="utf-8">
-<title>Caminho de Anchieta</title>
-<meta name="viewport" content="width=device-width, initial-scale=1">
-<link rel="icon" href="/static/favicon.ico" type="image/x-icon">
-<style>
-body { margin:0; font-family: Arial, sans-serif; background:#0b2a4a; }
-
-/* Topo */
-.topo {
-    background:white; padding:15px 20px; display:flex; align-items:center; justify-content:space-between;
-    border-bottom:4px solid #d4a017; box-shadow:0 2px 8px rgba(0,0,0,0.15);
-}
-.topo img { height:90px; }
-.titulo-container { text-align:center; flex:1; }
-.titulo { font-size:32px; font-weight:bold; color:#0b2a4a; }
-.subtitulo { font-size:14px; color:#555; }
-
-/* Layout */
-.container { display:flex; min-height: calc(100vh - 140px); }
-
-/* Menu */
-.menu {
-    width:220px; background:#123c6b; padding:15px; color:white;
-}
-.menu h3 { margin-top:0; border-bottom:1px solid #ffffff55; padding-bottom:5px; }
-.menu button {
-    width:100%; margin:6px 0; padding:10px; border:none; border-radius:6px;
-    background:#d4a017; color:#0b2a4a; font-weight:bold; cursor:pointer;
-}
-.menu button:hover { background:#e6b737; }
-
-/* Chat */
-.chat-area { flex:1; padding:20px; }
-.chat-box {
-    background:white; border-radius:12px; padding:15px; height:60vh; overflow-y:auto;
-    box-shadow:0 4px 10px rgba(0,0,0,0.2);
-}
-
-/* Versículo */
-.versiculo {
-    background:#d4a017; color:#0b2a4a; padding:10px; border-radius:8px; margin-bottom:10px;
-    text-align:center; font-weight:bold;
-}
-
-/* Balões */
-.msg { margin:10px 0; display:flex; }
-.msg.user { justify-content:flex-end; }
-.msg.ia { justify-content:flex-start; }
-.balao { max-width:70%; padding:10px 14px; border-radius:15px; }
-.user .balao { background:#0b2a4a; color:white; border-bottom-right-radius:0; }
-.ia .balao { background:#e9ecef; color:#000; border-bottom-left-radius:0; }
-
-/* Entrada */
-.form-area { margin-top:10px; display:flex; gap:10px; }
-.form-area input {
-    flex:1; padding:12px; border-radius:8px; border:1px solid #ccc;
-}
-.form-area button {
-    padding:12px 16px; border-radius:8px; border:none; background:#0b2a4a; color:white; font-weight:bold;
-    cursor:pointer;
-}
-.form-area button:hover { background:#123c6b; }
-
-@media (max-width:700px) {
-    .menu { display:none; }
-    .topo img { height:60px; }
-    .titulo { font-size:24px; }
-}
-</style>
-</head>
-<body>
-
-<div class="topo">
-    <img src="/static/logo_paroquia.png">
-    <div class="titulo-container">
-        <div class="titulo">Caminho de Anchieta</div>
-        <div class="subtitulo">Assistente da Paróquia São José de Anchieta</div>
-    </div>
-    <img src="/static/logo_pascom.png">
-</div>
-
-<div class="container">
-
-    <div class="menu">
-        <h3>Menu</h3>
-        <form method="post"><input type="hidden" name="pergunta" value="Qual o horário da missa?"><button>Missas</button></form>
-        <form method="post"><input type="hidden" name="pergunta" value="O que é o Batismo?"><button>Sacramentos</button></form>
-        <form method="post"><input type="hidden" name="pergunta" value="Como entrar na catequese?"><button>Catequese</button></form>
-        <form method="post"><input type="hidden" name="pergunta" value="Qual o contato da secretaria paroquial?"><button>Contato</button></form>
-        <form method="post" action="/limpar"><button>Limpar conversa</button></form>
-        <br>
-        <a href="/login" style="color:white;">Área Administrativa</a>
-    </div>
-
-    <div class="chat-area">
-        <div class="versiculo">Versículo do dia: {{ versiculo }}</div>
-
-        <div class="chat-box">
-            {% for autor, texto in historico %}
-                <div class="msg {{ autor }}">
-                    <div class="balao">{{ texto }}</div>
-                </div>
-            {% endfor %}
-        </div>
-
-        <form method="post" class="form-area">
-            <input type="text" name="pergunta" placeholder="Digite sua pergunta...">
-            <button type="submit">Enviar</button>
-        </form>
-    </div>
-
-</div>
-
-</body>
-</html>
-"""
+    return kb.responder(pergunta)
 
+# ---------- Mensagens ----------
 MENSAGEM_INICIAL = (
     "Olá! 👋 Seja bem-vindo ao Caminho de Anchieta.\n\n"
     "Sou o assistente da Paróquia São José de Anchieta.\n"
@@ -324,27 +713,95 @@ MENSAGEM_INICIAL = (
 )
 
 # ---------- Rotas ----------
+def responder_na_conversa(conversa, pergunta):
+    item, pontuacao = kb.avaliar(pergunta)
+    resposta = item.resposta if item else RESPOSTA_PADRAO
+    adicionar_mensagens(conversa, [("user", pergunta), ("ia", resposta)])
+
+    salvar_historico(pergunta, resposta, item is not None, pontuacao, item and item.chave)
+    return resposta
+
+def versao_chat():
+    # muda quando os templates da página do chat ou a mensagem inicial mudam
+    h = hashlib.sha256(MENSAGEM_INICIAL.encode("utf-8"))
+    for nome in ("chat.html", "_mensagem.html", "_logo.html"):
+        with open(os.path.join(app.root_path, "templates", nome), "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()[:10]
+
+VERSAO_CHAT = versao_chat()
+
+def etag_chat(conversa):
+    # A página do chat só muda com a conversa (a última mensagem dela), o
+    # versículo do dia e os arquivos estáticos. Conferir isso custa uma
+    # consulta pelo índice de mensagens, sem montar a página. A ETag é
+    # fraca: vale para a página com ou sem compressão.
+    conn = get_db()
+    ultima = conn.execute("SELECT MAX(id) FROM mensagens WHERE conversa = ?", (conversa,)).fetchone()[0]
+    conn.close()
+    chave = f"{conversa}:{ultima}:{versiculo_do_dia()}:{ESTATICOS['versao']}:{VERSAO_CHAT}"
+    return hashlib.sha256(chave.encode("utf-8")).hexdigest()[:20]
+
 @app.route("/", methods=["GET", "POST"])
 def index():
-    if "historico" not in session:
-        session["historico"] = [("ia", MENSAGEM_INICIAL)]
+    conversa = session.get("conversa") or nova_conversa()
 
     if request.method == "POST":
         pergunta = request.form.get("pergunta", "").strip()
         if pergunta:
-            historico = session["historico"]
-            historico.append(("user", pergunta))
-            resposta = escolher_resposta(pergunta)
-            historico.append(("ia", resposta))
-            session["historico"] = historico
-
-            salvar_historico(pergunta, resposta)
-
-    return render_template_string(HTML, historico=session["historico"], versiculo=versiculo_do_dia())
+            responder_na_conversa(conversa, pergunta)
+        return render_template("chat.html", historico=carregar_conversa(conversa), versiculo=versiculo_do_dia())
+
+    # GET: o navegador guarda a página, mas confere a cada visita (no-cache);
+    # se nada mudou, responde 304 sem corpo
+    etag = etag_chat(conversa)
+    if request.if_none_match.contains_weak(etag):
+        resposta = make_response("", 304)
+    else:
+        resposta = make_response(render_template("chat.html", historico=carregar_conversa(conversa),
+                                                 versiculo=versiculo_do_dia()))
+    resposta.set_etag(etag, weak=True)
+    resposta.cache_control.private = True
+    resposta.cache_control.no_cache = True
+    return resposta
+
+# Usada pelo static/js/chat.js: devolve só a resposta nova em vez da página
+# inteira. Sem JavaScript o formulário continua indo para "/".
+@app.route("/api/perguntar", methods=["POST"])
+def api_perguntar():
+    # JSON ({"pergunta": "..."}) ou formulário; qualquer outra coisa é 400
+    if request.is_json:
+        try:
+            dados = request.get_json()
+        except BadRequest:
+            return jsonify(erro="JSON inválido"), 400
+        if not isinstance(dados, dict):
+            return jsonify(erro="Envie um objeto JSON com o campo pergunta"), 400
+    else:
+        dados = request.form
+    pergunta = dados.get("pergunta", "")
+    if not isinstance(pergunta, str):
+        return jsonify(erro="O campo pergunta deve ser texto"), 400
+    pergunta = pergunta.strip()
+    if not pergunta:
+        return jsonify(erro="Pergunta vazia"), 400
+
+    conversa = session.get("conversa") or nova_conversa()
+    resposta = responder_na_conversa(conversa, pergunta)
+    return jsonify(pergunta=pergunta, resposta=resposta)
+
+# Autocompletar do campo de pergunta (static/js/chat.js): frases-chave da base
+# que começam com o que foi digitado, as mais perguntadas primeiro.
+@app.route("/api/sugestoes")
+def api_sugestoes():
+    texto = request.args.get("q", "")[:100]
+    return jsonify(sugestoes=kb.sugerir(texto) if texto.strip() else [])
 
 @app.route("/limpar", methods=["POST"])
 def limpar():
-    session["historico"] = [("ia", MENSAGEM_INICIAL)]
+    if session.get("conversa"):
+        limpar_conversa(session["conversa"])
+    nova_conversa()
     return redirect(url_for("index"))
 
 @app.route("/login", methods=["GET", "POST"])
@@ -361,37 +818,12 @@ def login():
             session["logado"] = True
             session["usuario"] = u["usuario"]
             session["perfil"] = u["perfil"]
-            session["historico"] = []
+            session.pop("conversa", None)
             return redirect(url_for("admin"))
         else:
             erro = "Usuário ou senha inválidos"
 
-    return render_template_string(f"""
-    <html>
-    <head>
-        <title>Login - Caminho de Anchieta</title>
-        <style>
-            body {{ font-family: Arial; background:#0b2a4a; color:#0b2a4a; }}
-            .box {{ background:white; padding:20px; border-radius:10px; width:300px; margin:80px auto; text-align:center; }}
-            input {{ width:90%; padding:10px; margin:8px 0; }}
-            button {{ padding:10px 15px; font-weight:bold; }}
-            .erro {{ color:red; }}
-        </style>
-    </head>
-    <body>
-        <div class="box">
-            <h2>Login Administrativo</h2>
-            <form method="post">
-                <input type="text" name="usuario" placeholder="Usuário" required><br>
-                <input type="password" name="senha" placeholder="Senha" required><br>
-                <button type="submit">Entrar</button>
-            </form>
-            <p class="erro">{erro}</p>
-            <a href="/">Voltar ao chat</a>
-        </div>
-    </body>
-    </html>
-    """)
+    return render_template("login.html", erro=erro)
 
 @app.route("/admin")
 def admin():
@@ -401,201 +833,14 @@ def admin():
     usuario = session.get("usuario", "")
     perfil = session.get("perfil", "")
 
-    return render_template_string("""
-<!DOCTYPE html>
-<html>
-<head>
-<meta charset="utf-8">
-<title>Painel Administrativo - Caminho de Anchieta</title>
-<meta name="viewport" content="width=device-width, initial-scale=1">
-<style>
-body { margin:0; font-family: Arial, sans-serif; background:#0b2a4a; }
-
-.topo {
-    background:white; padding:15px 20px; display:flex; align-items:center; justify-content:space-between;
-    border-bottom:4px solid #d4a017; box-shadow:0 2px 8px rgba(0,0,0,0.15);
-}
-.topo img { height:70px; }
-.titulo { font-size:26px; font-weight:bold; color:#0b2a4a; }
-
-.container { padding:30px; }
-
-.info {
-    color:white;
-    margin-bottom:20px;
-}
-
-.grid {
-    display:grid;
-    grid-template-columns: repeat(auto-fit, minmax(220px, 1fr));
-    gap:20px;
-}
-
-.card {
-    background:white;
-    border-radius:12px;
-    padding:20px;
-    text-align:center;
-    box-shadow:0 4px 10px rgba(0,0,0,0.2);
-    transition: transform 0.2s;
-}
-
-.card:hover { transform: translateY(-5px); }
-
-.card h3 { margin-top:0; color:#0b2a4a; }
-.card p { color:#555; }
-
-.card a {
-    display:inline-block;
-    margin-top:10px;
-    padding:10px 15px;
-    background:#d4a017;
-    color:#0b2a4a;
-    text-decoration:none;
-    border-radius:8px;
-    font-weight:bold;
-}
-
-.card a:hover { background:#e6b737; }
-</style>
-</head>
-<body>
-
-<div class="topo">
-    <img src="/static/logo_paroquia.png">
-    <div class="titulo">Painel Administrativo - Caminho de Anchieta</div>
-    <img src="/static/logo_pascom.png">
-</div>
-
-<div class="container">
-
-    <div class="info">
-        Usuário: <b>{{ usuario }}</b> | Perfil: <b>{{ perfil }}</b>
-    </div>
-
-    <div class="grid">
-
-        <div class="card">
-            <h3>✏️ Editor da Base</h3>
-            <p>Editar a base de conhecimento do assistente.</p>
-            <a href="/admin/editor">Acessar</a>
-        </div>
-
-        <div class="card">
-            <h3>📜 Histórico</h3>
-            <p>Em breve: ver perguntas e respostas.</p>
-            <a href="/admin/historico">Acessar</a>
-        </div>
-
-        <div class="card">
-            <h3>👥 Usuários</h3>
-            <p>Em breve: gerenciar usuários.</p>
-            <a href="/admin/usuarios">Acessar</a>
-        </div>
-
-        <div class="card">
-            <h3>💬 Voltar ao Chat</h3>
-            <p>Retornar ao assistente da paróquia.</p>
-            <a href="/">Voltar</a>
-        </div>
-
-        <div class="card">
-            <h3>🚪 Logout</h3>
-            <p>Encerrar sua sessão com segurança.</p>
-            <a href="/logout">Sair</a>
-        </div>
-
-    </div>
-</div>
-
-</body>
-</html>
-""", usuario=usuario, perfil=perfil)
+    return render_template("admin.html", usuario=usuario, perfil=perfil, cache=kb.estatisticas_cache())
 
 @app.route("/admin/editor")
 def admin_editor_home():
     if not session.get("logado"):
         return redirect(url_for("login"))
 
-    return render_template_string("""
-<!DOCTYPE html>
-<html>
-<head>
-<meta charset="utf-8">
-<title>Editor da Base - Caminho de Anchieta</title>
-<meta name="viewport" content="width=device-width, initial-scale=1">
-<style>
-body { margin:0; font-family: Arial, sans-serif; background:#0b2a4a; }
-.topo {
-    background:white; padding:15px 20px; display:flex; align-items:center; justify-content:space-between;
-    border-bottom:4px solid #d4a017; box-shadow:0 2px 8px rgba(0,0,0,0.15);
-}
-.topo img { height:70px; }
-.titulo { font-size:26px; font-weight:bold; color:#0b2a4a; }
-
-.container { padding:30px; }
-
-.grid {
-    display:grid;
-    grid-template-columns: repeat(auto-fit, minmax(220px, 1fr));
-    gap:20px;
-}
-
-.card {
-    background:white;
-    border-radius:12px;
-    padding:20px;
-    text-align:center;
-    box-shadow:0 4px 10px rgba(0,0,0,0.2);
-}
-
-.card h3 { margin-top:0; color:#0b2a4a; }
-
-.card a {
-    display:inline-block;
-    margin-top:10px;
-    padding:10px 15px;
-    background:#d4a017;
-    color:#0b2a4a;
-    text-decoration:none;
-    border-radius:8px;
-    font-weight:bold;
-}
-.card a:hover { background:#e6b737; }
-
-.voltar {
-    display:inline-block;
-    margin-top:20px;
-    color:white;
-    text-decoration:none;
-    font-weight:bold;
-}
-</style>
-</head>
-<body>
-
-<div class="topo">
-    <img src="/static/logo_paroquia.png">
-    <div class="titulo">Escolha o que deseja editar</div>
-    <img src="/static/logo_pascom.png">
-</div>
-
-<div class="container">
-    <div class="grid">
-        {% for k in secoes.keys() %}
-        <div class="card">
-            <h3>{{ k.replace("_"," ").title() }}</h3>
-            <a href="/admin/editor/editar?secao={{ k }}">Editar</a>
-        </div>
-        {% endfor %}
-    </div>
-
-    <a class="voltar" href="/admin">⬅ Voltar ao painel</a>
-</div>
-
-</body>
-</html>
-""", secoes=SECOES)
+    return render_template("editor.html", secoes=SECOES)
 
 @app.route("/admin/editor/editar", methods=["GET", "POST"])
 def admin_editor_secao():
@@ -617,8 +862,7 @@ def admin_editor_secao():
         with open(caminho, "w", encoding="utf-8") as f:
             f.write(novo_conteudo)
 
-        global base
-        base = carregar_base()
+        kb.publicar(secao)
         mensagem = "Seção atualizada com sucesso! (Backup criado automaticamente)"
 
     if os.path.exists(caminho):
@@ -627,114 +871,98 @@ def admin_editor_secao():
     else:
         conteudo = ""
 
-    return render_template_string("""
-<!DOCTYPE html>
-<html>
-<head>
-<meta charset="utf-8">
-<title>Editando {{ secao }}</title>
-<meta name="viewport" content="width=device-width, initial-scale=1">
-<style>
-body { margin:0; font-family: Arial, sans-serif; background:#0b2a4a; }
-.topo {
-    background:white; padding:15px 20px; border-bottom:4px solid #d4a017;
-}
-.container { padding:20px; }
-.box {
-    background:white; padding:20px; border-radius:12px; max-width:1100px; margin:auto;
-}
-textarea {
-    width:100%; height:420px; padding:10px; font-family: monospace;
-}
-button {
-    padding:10px 16px; border-radius:8px; border:none; background:#d4a017;
-    font-weight:bold; color:#0b2a4a; cursor:pointer;
-}
-.msg { color:green; font-weight:bold; }
-a { display:inline-block; margin-top:15px; font-weight:bold; color:#0b2a4a; text-decoration:none; }
-</style>
-</head>
-<body>
-
-<div class="topo">
-    <b>Editando:</b> {{ secaootni.replace("_"," ").title() if False else secao.replace("_"," ").title() }}
-</div>
+    return render_template(
+        "editor_secao.html", secao=secao, conteudo=conteudo, mensagem=mensagem,
+        avisos=kb.avisos(secao),
+    )
 
-<div class="container">
-    <div class="box">
-        {% if mensagem %}<div class="msg">{{ mensagem }}</div>{% endif %}
+@app.route("/admin/historico")
+def admin_historico():
+    if not session.get("logado"):
+        return redirect(url_for("login"))
 
-        <form method="post">
-            <textarea name="base">{{ conteudo }}</textarea><br><br>
-            <button type="submit">💾 Salvar</button>
-        </form>
+    texto = request.args.get("q", "").strip()
+    de = ler_data(request.args.get("de"))
+    ate = ler_data(request.args.get("ate"))
+    antes = None
+    if request.args.get("antes", "").isdigit():
+        antes = int(request.args["antes"])
+
+    registros = buscar_historico(texto, de, ate, antes)
+    proxima = None
+    if len(registros) > HISTORICO_POR_PAGINA:
+        registros = registros[:HISTORICO_POR_PAGINA]
+        ultimo = registros[-1]
+        proxima = url_for(
+            "admin_historico", q=texto or None,
+            de=de and de.isoformat(), ate=ate and ate.isoformat(),
+            antes=ultimo["id"],
+        )
 
-        <a href="/admin/editor">⬅ Voltar aos tópicos</a>
-    </div>
-</div>
+    return render_template(
+        "historico.html", registros=registros, proxima=proxima,
+        q=texto, de=de, ate=ate, pagina_inicial=antes is None,
+    )
 
-</body>
-</html>
-""", secao=secao, conteudo=conteudo, mensagem=mensagem)
+ESTATISTICAS_TOP = 20        # perguntas em cada lista do painel
+ESTATISTICAS_SERIE = 14      # períodos anteriores no gráfico de totais
 
-@app.route("/admin/historico")
-def admin_historico():
+@app.route("/admin/estatisticas")
+def admin_estatisticas():
     if not session.get("logado"):
         return redirect(url_for("login"))
 
+    periodo = request.args.get("periodo")
+    if periodo not in ("dia", "semana"):
+        periodo = "dia"
+    dia = ler_data(request.args.get("inicio")) or date.today()
+    # longe o bastante dos extremos para dia ± passo ainda ser uma data
+    dia = min(max(dia, date.min + timedelta(days=7)), date.max - timedelta(days=7))
+    passo = timedelta(days=1)
+    if periodo == "semana":
+        dia -= timedelta(days=dia.weekday())
+        passo = timedelta(days=7)
+    inicio = dia.isoformat()
+
+    # tudo sai das tabelas de resumo pelas chaves/índices: o custo não
+    # depende do tamanho do histórico
     conn = get_db()
-    cur = conn.execute("SELECT * FROM historico ORDER BY id DESC LIMIT 200")
-    registros = cur.fetchall()
+    listas = {}
+    for respondida in (0, 1):
+        listas[respondida] = conn.execute("""
+            SELECT pergunta, entrada, vezes FROM resumo_perguntas
+            WHERE periodo = ? AND inicio = ? AND respondida = ?
+            ORDER BY vezes DESC LIMIT ?
+        """, (periodo, inicio, respondida, ESTATISTICAS_TOP)).fetchall()
+    serie = conn.execute("""
+        SELECT inicio, respondidas, sem_resposta FROM resumo_totais
+        WHERE periodo = ? AND inicio <= ?
+        ORDER BY inicio DESC LIMIT ?
+    """, (periodo, inicio, ESTATISTICAS_SERIE)).fetchall()
     conn.close()
 
-    return render_template_string("""
-<!DOCTYPE html>
-<html>
-<head>
-<meta charset="utf-8">
-<title>Histórico - Caminho de Anchieta</title>
-<meta name="viewport" content="width=device-width, initial-scale=1">
-<style>
-body { margin:0; font-family: Arial, sans-serif; background:#0b2a4a; }
-.topo {
-    background:white; padding:15px 20px; border-bottom:4px solid #d4a017;
-    font-size:24px; font-weight:bold; color:#0b2a4a;
-}
-.container { padding:20px; }
-.box {
-    background:white; padding:20px; border-radius:12px; max-width:1200px; margin:auto;
-}
-.item {
-    border-bottom:1px solid #ddd;
-    padding:10px 0;
-}
-.data { font-size:12px; color:#666; }
-.pergunta { font-weight:bold; color:#0b2a4a; }
-.resposta { margin-top:5px; }
-a { display:inline-block; margin-top:15px; font-weight:bold; color:#0b2a4a; text-decoration:none; }
-</style>
-</head>
-<body>
-
-<div class="topo">📜 Histórico de Perguntas e Respostas</div>
-
-<div class="container">
-    <div class="box">
-        {% for r in registros %}
-            <div class="item">
-                <div class="data">{{ r["data_hora"] }}</div>
-                <div class="pergunta">❓ {{ r["pergunta"] }}</div>
-                <div class="resposta">💬 {{ r["resposta"] }}</div>
-            </div>
-        {% endfor %}
-
-        <a href="/admin">⬅ Voltar ao painel</a>
-    </div>
-</div>
-
-</body>
-</html>
-""", registros=registros)
+    # a entrada aparece pelo título gravado junto da chave; linhas antigas
+    # guardavam só o título
+    for respondida, linhas in listas.items():
+        listas[respondida] = [
+            dict(l, chave=l["entrada"], entrada=(l["entrada"] or "").rpartition("#")[0] or l["entrada"])
+            for l in linhas
+        ]
+
+    total = serie[0] if serie and serie[0]["inicio"] == inicio else None
+    maior = max([l["respondidas"] + l["sem_resposta"] for l in serie] or [0])
+    return render_template(
+        "estatisticas.html", periodo=periodo, inicio=inicio,
+        anterior=(dia - passo).isoformat(), seguinte=(dia + passo).isoformat(),
+        total=total, sem_resposta=listas[0], respondidas=listas[1],
+        serie=list(reversed(serie)), maior=maior,
+    )
+
+def ler_data(valor):
+    try:
+        return date.fromisoformat(valor)
+    except (TypeError, ValueError):
+        return None
 
 @app.route("/admin/usuarios", methods=["GET", "POST"])
 def admin_usuarios():
@@ -772,85 +1000,7 @@ def admin_usuarios():
     usuarios = cur.fetchall()
     conn.close()
 
-    return render_template_string("""
-<!DOCTYPE html>
-<html>
-<head>
-<meta charset="utf-8">
-<title>Gerenciar Usuários</title>
-<meta name="viewport" content="width=device-width, initial-scale=1">
-<style>
-body { margin:0; font-family: Arial, sans-serif; background:#0b2a4a; }
-.topo { background:white; padding:15px 20px; border-bottom:4px solid #d4a017; font-size:24px; font-weight:bold; color:#0b2a4a; }
-.container { padding:20px; }
-.box { background:white; padding:20px; border-radius:12px; max-width:1000px; margin:auto; }
-
-table { width:100%; border-collapse:collapse; margin-top:20px; }
-th, td { padding:8px; border-bottom:1px solid #ddd; text-align:left; }
-
-input, select { padding:8px; margin:5px 0; width:100%; }
-button { padding:10px 16px; border-radius:8px; border:none; background:#d4a017; font-weight:bold; color:#0b2a4a; cursor:pointer; }
-.msg { margin-top:10px; font-weight:bold; color:green; }
-.erro { margin-top:10px; font-weight:bold; color:red; }
-
-a { display:inline-block; margin-top:15px; font-weight:bold; color:#0b2a4a; text-decoration:none; }
-</style>
-</head>
-<body>
-
-<div class="topo">👥 Gerenciar Usuários</div>
-
-<div class="container">
-<div class="box">
-
-<h3>Criar novo usuário</h3>
-<form method="post">
-    <input type="text" name="usuario" placeholder="Usuário">
-    <input type="password" name="senha" placeholder="Senha">
-    <select name="perfil">
-        <option value="">Selecione o perfil</option>
-        <option value="admin">Admin</option>
-        <option value="secretaria">Secretaria</option>
-        <option value="pascom">Pascom</option>
-        <option value="padre">Padre</option>
-    </select>
-    <button type="submit">➕ Criar usuário</button>
-</form>
-
-{% if mensagem %}
-<div class="msg">{{ mensagem }}</div>
-{% endif %}
-
-<h3>Usuários cadastrados</h3>
-<table>
-<tr>
-    <th>Usuário</th>
-    <th>Perfil</th>
-    <th>Ações</th>
-</tr>
-{% for u in usuarios %}
-<tr>
-    <td>{{ u["usuario"] }}</td>
-    <td>{{ u["perfil"] }}</td>
-    <td>
-        {% if u["usuario"] != "admin" %}
-            <a href="/admin/usuarios/excluir/{{ u['id'] }}">🗑 Excluir</a>
-        {% else %}
-            —
-        {% endif %}
-    </td>
-</tr>
-{% endfor %}
-</table>
-
-<a href="/admin">⬅ Voltar ao painel</a>
-
-</div>
-</div>
-
-</body>
-</html>
-""", usuarios=usuarios, mensagem=mensagem)
+    return render_template("usuarios.html", usuarios=usuarios, mensagem=mensagem)
 
 @app.route("/admin/usuarios/excluir/<int:user_id>")
 def excluir_usuario(user_id):
@@ -872,6 +1022,14 @@ def logout():
     session.clear()
     return redirect(url_for("index"))
 
+# ---------- CLI ----------
+@app.cli.command("compilar-base")
+def compilar_base():
+    """Lê e indexa todas as seções e grava a base compilada."""
+    kb.compilar()
+    kb.publicar()
+    print(f"Base compilada em {BASE_COMPILADA} ({len(kb.base)} itens).")
+
 # ---------- Run ----------
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)